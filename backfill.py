@@ -0,0 +1,194 @@
+'''
+Rescore historical events after a model change.
+
+    python backfill.py --json data/data.json --out backfill/ --shards 32
+    python backfill.py --mongo --out backfill/ --workers 8
+
+Events are split into --shards object_id ranges, and the shards are
+feature-engineered and scored in a process pool (one worker per core by
+default). Each finished shard is written as <out>/shard-NNNN.csv in
+chunk-sized bulk writes and then renamed into place. That file is the
+shard's checkpoint: rerunning the same command after a crash or kill
+skips finished shards and redoes only the rest. When every shard is
+done they are concatenated into <out>/scores.csv.
+
+For --json, the file is streamed once to find the object_id range and
+once more to split it into per-shard JSON-lines inputs under <out>/input/.
+The split records its shard count and bounds in <out>/input/DONE. A rerun
+with a different --shards re-splits and discards the old shard outputs.
+'''
+import os
+import json
+import glob
+import argparse
+import multiprocessing
+import pandas as pd
+from pymongo import MongoClient
+from models import scoring
+from models.data_loader import iter_records, iter_chunks
+from models.data_pipeline import DATA_COLUMNS
+from models.model_registry import registry
+
+CHUNKSIZE = 5000
+SCORE_COLUMNS = ['object_id', 'fraud_probability', 'risk_tier', 'label', 'model_version']
+
+
+def shard_bounds(lo, hi, n_shards):
+    #n_shards contiguous [start, stop) object_id ranges covering [lo, hi]
+    edges = [lo + (hi + 1 - lo) * i // n_shards for i in range(n_shards + 1)]
+    return zip(edges[:-1], edges[1:])
+
+def shard_of(object_id, bounds):
+    for i, (start, stop) in enumerate(bounds):
+        if start <= object_id < stop:
+            return i
+    raise ValueError('object_id %r outside shard bounds' % object_id)
+
+def read_split(out):
+    #{'path', 'shards', 'bounds'} of a finished split, or None
+    try:
+        with open(os.path.join(out, 'input', 'DONE')) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+def clear_shards(out):
+    #Drop inputs and checkpoints from a split with different shard bounds
+    for path in (glob.glob(os.path.join(out, 'input', '*')) +
+                 glob.glob(os.path.join(out, 'shard-*.csv*'))):
+        os.remove(path)
+
+def split_json(path, out, n_shards):
+    '''
+    Write each event's model columns to <out>/input/shard-NNNN.jsonl by
+    object_id range. Skipped if a previous run already split the same file
+    into the same number of shards.
+    '''
+    input_dir = os.path.join(out, 'input')
+    done = os.path.join(input_dir, 'DONE')
+    split = read_split(out)
+    if split and split['shards'] == n_shards and split['path'] == os.path.abspath(path):
+        return
+    if os.path.isdir(input_dir):
+        clear_shards(out)
+    else:
+        os.makedirs(input_dir)
+
+    lo = hi = None
+    for record in iter_records(path):
+        object_id = record['object_id']
+        lo = object_id if lo is None else min(lo, object_id)
+        hi = object_id if hi is None else max(hi, object_id)
+    bounds = shard_bounds(lo, hi, n_shards) if lo is not None else []
+    files = [open(shard_input(out, i), 'w') for i in range(n_shards)]
+    try:
+        for record in iter_records(path):
+            row = dict((column, record.get(column)) for column in DATA_COLUMNS)
+            files[shard_of(record['object_id'], bounds)].write(json.dumps(row) + '\n')
+    finally:
+        for f in files:
+            f.close()
+    with open(done, 'w') as f:
+        json.dump({'path': os.path.abspath(path), 'shards': n_shards, 'bounds': bounds}, f)
+
+def shard_input(out, shard):
+    return os.path.join(out, 'input', 'shard-%04d.jsonl' % shard)
+
+def shard_output(out, shard):
+    return os.path.join(out, 'shard-%04d.csv' % shard)
+
+def mongo_chunks(bounds, chunksize):
+    #DataFrames of the events in one object_id range, read from fraudly.fraud
+    start, stop = bounds
+    projection = dict((column, 1) for column in DATA_COLUMNS)
+    projection['_id'] = 0
+    cursor = (MongoClient()['fraudly']['fraud']
+              .find({'object_id': {'$gte': start, '$lt': stop}}, projection)
+              .batch_size(chunksize))
+    rows = []
+    for doc in cursor:
+        rows.append(doc)
+        if len(rows) >= chunksize:
+            yield pd.DataFrame(rows, columns=DATA_COLUMNS)
+            rows = []
+    if rows:
+        yield pd.DataFrame(rows, columns=DATA_COLUMNS)
+
+def score_shard(task):
+    shard, out, source, bounds, model_name, chunksize = task
+    final = shard_output(out, shard)
+    if os.path.exists(final):
+        return shard, 'skipped'
+    if source == 'mongo':
+        chunks = mongo_chunks(bounds, chunksize)
+    else:
+        chunks = iter_chunks(shard_input(out, shard), chunksize, label=False)
+
+    point = registry.get('operating_point')
+    version = registry.version(model_name)
+    tmp = final + '.tmp'
+    header = True
+    with open(tmp, 'w') as f:
+        for df in chunks:
+            probabilities = scoring.fraud_probabilities(df, model_name)
+            pd.DataFrame({'object_id': df['object_id'].values,
+                          'fraud_probability': probabilities,
+                          'risk_tier': scoring.risk_tiers(probabilities, point),
+                          'label': (probabilities >= point['threshold']).astype(int),
+                          'model_version': version},
+                         columns=SCORE_COLUMNS).to_csv(f, index=False, header=header)
+            header = False
+        if header:
+            # no events in this object_id range: header-only file
+            pd.DataFrame(columns=SCORE_COLUMNS).to_csv(f, index=False)
+    os.rename(tmp, final)
+    return shard, 'scored'
+
+def mongo_bounds(n_shards):
+    table = MongoClient()['fraudly']['fraud']
+    lo = table.find_one(sort=[('object_id', 1)])['object_id']
+    hi = table.find_one(sort=[('object_id', -1)])['object_id']
+    return shard_bounds(lo, hi, n_shards)
+
+def backfill(out, json_path=None, shards=32, workers=None, model_name=scoring.MODEL_NAME,
+             chunksize=CHUNKSIZE):
+    if not os.path.isdir(out):
+        os.makedirs(out)
+    if json_path:
+        split_json(json_path, out, shards)
+        source, bounds = 'json', [None] * shards
+    else:
+        source, bounds = 'mongo', mongo_bounds(shards)
+
+    # load once in the parent; forked workers share it
+    registry.warm([model_name, 'operating_point'])
+    tasks = [(i, out, source, bounds[i], model_name, chunksize) for i in range(shards)]
+    pool = multiprocessing.Pool(workers or multiprocessing.cpu_count())
+    try:
+        for shard, status in pool.imap_unordered(score_shard, tasks):
+            print 'shard %d: %s' % (shard, status)
+    finally:
+        pool.close()
+        pool.join()
+
+    combined = os.path.join(out, 'scores.csv')
+    # skip 0-byte files left by runs from before empty shards got a header
+    paths = [p for p in sorted(glob.glob(os.path.join(out, 'shard-*.csv')))
+             if os.path.getsize(p) > 0]
+    frames = [pd.read_csv(p) for p in paths] or [pd.DataFrame(columns=SCORE_COLUMNS)]
+    pd.concat(frames, ignore_index=True).to_csv(combined, index=False)
+    print 'wrote %s' % combined
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rescore historical events in parallel shards')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--json', help='event dump (JSON array or JSON lines)')
+    source.add_argument('--mongo', action='store_true', help='read the fraudly.fraud collection')
+    parser.add_argument('--out', required=True, help='output / checkpoint directory')
+    parser.add_argument('--shards', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--model', default=scoring.MODEL_NAME, help='registry name of the model')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    args = parser.parse_args()
+
+    backfill(args.out, args.json, args.shards, args.workers, args.model, args.chunksize)
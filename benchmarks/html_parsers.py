@@ -0,0 +1,83 @@
+'''
+HTML-to-text timings: text_cleaning.strip_html against BeautifulSoup.
+
+    python benchmarks/html_parsers.py --out html.json          # default sizes 1000,10000
+    python benchmarks/html_parsers.py --sizes 100 --repeat 3
+
+Cases, each over the synthetic descriptions (benchmarks/synthetic.py)
+with no cache in front:
+
+    strip_html         the stdlib HTMLParser extractor the pipeline uses
+    bs4_<parser>       BeautifulSoup(cell, parser).get_text(), for
+                       html.parser and for lxml / html5lib when installed
+
+Before timing, every description is checked to give the same text
+through strip_html and BeautifulSoup's html.parser, and the number of
+mismatches is recorded. The JSON has the same layout as run.py, so
+run.py --compare works on it.
+'''
+from __future__ import division
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'models'))
+sys.path.insert(0, HERE)
+
+from text_cleaning import strip_html
+from synthetic import make_events
+from run import measure, record, git_commit
+
+PARSERS = ['html.parser', 'lxml', 'html5lib']
+
+
+def soup_text(parser):
+    return lambda cell: BeautifulSoup(cell, parser).get_text()
+
+def mismatches(cells):
+    reference = soup_text('html.parser')
+    return sum(strip_html(cell) != reference(cell) for cell in cells)
+
+def run(sizes, repeat=5, seed=0):
+    results = []
+    cells = [event['description'] for event in make_events(max(sizes), seed)]
+    cases = [('strip_html', strip_html)]
+    cases += [('bs4_' + parser.replace('.', '_'), soup_text(parser))
+              for parser in PARSERS if builder_registry.lookup(parser) is not None]
+
+    checked = mismatches(cells)
+    print '%d of %d descriptions differ from BeautifulSoup html.parser' % (checked, len(cells))
+
+    for n in sizes:
+        batch = cells[:n]
+        for name, strip in cases:
+            record(results, name, n, measure(lambda: [strip(cell) for cell in batch], repeat))
+
+    return {'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'sizes': sizes, 'repeat': repeat, 'seed': seed,
+            'mismatches': checked,
+            'results': results}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark HTML stripping')
+    parser.add_argument('--sizes', default='1000,10000', help='comma-separated batch sizes')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='write results as JSON here')
+    args = parser.parse_args()
+
+    report = run([int(n) for n in args.sizes.split(',')], args.repeat, args.seed)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print 'wrote %s' % args.out
@@ -0,0 +1,193 @@
+'''
+Timing baselines for feature engineering and inference.
+
+    python benchmarks/run.py --out bench.json                # default sizes 1000,10000
+    python benchmarks/run.py --sizes 100,1000 --repeat 3
+    python benchmarks/run.py --compare old.json new.json     # median ratios, new / old
+
+All inputs are synthetic events (benchmarks/synthetic.py), so no
+data/data.json, Mongo or network is needed. Cases:
+
+    frame              pd.DataFrame from raw event dicts
+    features           feature_engineering (single event and batches)
+    html_clean         clean_column over the descriptions, cache cleared
+    topics             topic_features: clean + vectorize + predict
+    <model>            predict_proba on engineered features
+    profit_curve       profit.profit_curve on n scores
+
+The shipped pickles (gdbr.pickle, rf.pickle, vectorizer3.pkl, model3.pkl,
+and the compiled .npz exports) are timed when they load. Otherwise a small
+GBM/RF or naive Bayes topic model is fit on synthetic data, and the
+result's "source" field says so. Only compare timings with the same
+source.
+
+Each case runs --repeat times and reports min / median / mean seconds per
+run and microseconds per event (from the min). The JSON also records the
+git commit and library versions.
+'''
+from __future__ import division
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from timeit import default_timer
+import numpy as np
+import pandas as pd
+import sklearn
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'models'))
+sys.path.insert(0, HERE)
+
+import profit
+import text_cleaning
+from data_pipeline import feature_engineering, topic_features, TOPICS, add_fraud_label
+from model_registry import registry
+from synthetic import make_events
+
+MODELS = ['gdbr', 'rf', 'gdbr_compiled', 'rf_compiled']
+COST_BENEFIT = np.array([[100, 0], [-200, 0]])
+
+
+def measure(f, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = default_timer()
+        f()
+        times.append(default_timer() - start)
+    return times
+
+def record(results, name, n, times, source=None):
+    result = {'name': name, 'n': n, 'repeat': len(times),
+              'min': min(times), 'median': float(np.median(times)), 'mean': float(np.mean(times)),
+              'us_per_event': 1e6 * min(times) / n}
+    if source:
+        result['source'] = source
+    results.append(result)
+    print '%-28s n=%-7d min %9.4fs  median %9.4fs  %10.1f us/event' % (
+        name, n, result['min'], result['median'], result['us_per_event'])
+
+def frame(events):
+    return add_fraud_label(pd.DataFrame(events))
+
+def load_or_fit_models(X, y):
+    #{name: (model, source)}: the shipped artifacts when they load, else synthetic fits
+    from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+    models = {}
+    for name in MODELS:
+        try:
+            models[name] = (registry.get(name), 'pickle')
+        except Exception:
+            pass
+    if 'gdbr' not in models:
+        models['gdbr'] = (GradientBoostingClassifier(n_estimators=100, max_depth=3, random_state=1).fit(X, y),
+                          'synthetic')
+    if 'rf' not in models:
+        models['rf'] = (RandomForestClassifier(n_estimators=100, random_state=1).fit(X, y), 'synthetic')
+    return models
+
+def load_or_fit_topics(df):
+    try:
+        return registry.get('vectorizer'), registry.get('topic_model'), 'pickle'
+    except Exception:
+        pass
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.naive_bayes import MultinomialNB
+    vectorizer = TfidfVectorizer(stop_words='english', max_features=5000)
+    X = vectorizer.fit_transform(text_cleaning.clean_column(df['description']))
+    labels = np.array(TOPICS)[np.arange(X.shape[0]) % len(TOPICS)]
+    return vectorizer, MultinomialNB().fit(X, labels), 'synthetic'
+
+def git_commit():
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=HERE, stderr=devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(sizes, repeat=5, single_repeat=200, seed=0):
+    results = []
+    events = make_events(max(sizes), seed)
+
+    # fit / load models once, on the largest batch
+    df = frame(events)
+    X = feature_engineering(df.copy())
+    models = load_or_fit_models(X.values, df['fraud'].values)
+    vectorizer, topic_model, topic_source = load_or_fit_topics(df)
+
+    one = events[:1]
+    X_one = feature_engineering(frame(one))
+    record(results, 'features_single', 1,
+           measure(lambda: feature_engineering(frame(one)), single_repeat))
+    for name, (model, source) in sorted(models.items()):
+        record(results, name + '_single', 1,
+               measure(lambda: model.predict_proba(X_one.values), single_repeat), source)
+
+    for n in sizes:
+        batch = events[:n]
+        df = frame(batch)
+        X = feature_engineering(df.copy())
+        record(results, 'frame', n, measure(lambda: frame(batch), repeat))
+        record(results, 'features', n, measure(lambda: feature_engineering(df.copy()), repeat))
+        record(results, 'html_clean', n,
+               measure(lambda: text_cleaning.clean_column(df['description']), repeat,
+                       setup=text_cleaning._cache.clear))
+        record(results, 'topics', n,
+               measure(lambda: topic_features(df.copy(), vectorizer, topic_model), repeat,
+                       setup=text_cleaning._cache.clear), topic_source)
+        for name, (model, source) in sorted(models.items()):
+            record(results, name, n, measure(lambda: model.predict_proba(X.values), repeat), source)
+
+        rng = np.random.RandomState(seed)
+        scores, labels = rng.rand(n), df['fraud'].values
+        record(results, 'profit_curve', n,
+               measure(lambda: profit.profit_curve(COST_BENEFIT, scores, labels), repeat))
+
+    return {'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'sklearn': sklearn.__version__,
+            'machine': platform.machine(),
+            'sizes': sizes, 'repeat': repeat, 'single_repeat': single_repeat, 'seed': seed,
+            'results': results}
+
+def compare(old_path, new_path):
+    #Median time ratio (new / old) for every case present in both runs
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    before = dict(((r['name'], r['n']), r) for r in old['results'])
+    print '%-28s %8s %12s %12s %8s' % ('case', 'n', 'old median', 'new median', 'ratio')
+    for r in new['results']:
+        key = (r['name'], r['n'])
+        if key not in before:
+            continue
+        note = '' if r.get('source') == before[key].get('source') else '  (model source differs)'
+        print '%-28s %8d %12.5f %12.5f %7.2fx%s' % (
+            r['name'], r['n'], before[key]['median'], r['median'],
+            r['median'] / before[key]['median'], note)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark feature engineering and inference')
+    parser.add_argument('--sizes', default='1000,10000', help='comma-separated batch sizes')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--single-repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='write results as JSON here')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        report = run([int(n) for n in args.sizes.split(',')], args.repeat, args.single_repeat, args.seed)
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump(report, f, indent=2)
+            print 'wrote %s' % args.out
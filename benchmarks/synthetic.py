@@ -0,0 +1,123 @@
+'''
+Synthetic events with the schema in Feature_Dictionary.md.
+
+make_events(n, seed) returns n raw event dicts with every DATA_COLUMNS
+field plus acct_type. Descriptions are HTML (paragraphs, bold, links,
+entities), and ticket_types / previous_payouts are lists of dicts shaped
+like the data.json ones. The values only roughly follow the real
+distributions. They are meant for timing, not modelling: the same
+(n, seed) always gives the same events, so runs are comparable across
+commits.
+'''
+import numpy as np
+
+WORDS = ('event tickets party music night live show festival club dance free '
+         'concert venue guest dinner wine tour class workshop conference '
+         'networking charity gala summer annual special join us bring friends '
+         'money cash payment transfer western union guaranteed opportunity '
+         'limited offer register now online contact email today').split()
+COUNTRIES = ['US', 'US', 'US', 'US', 'GB', 'GB', 'CA', 'AU', 'NZ', 'IE', 'NG', 'PH', 'MA', '']
+CURRENCIES = {'US': 'USD', 'GB': 'GBP', 'CA': 'CAD', 'AU': 'AUD', 'NZ': 'NZD', 'IE': 'EUR'}
+DOMAINS = ['gmail.com', 'yahoo.com', 'hotmail.com', 'aol.com', 'comcast.net',
+           'company.com', 'charity.org', 'university.edu', 'yahoo.co.uk']
+ACCT_TYPES = ['premium', 'spammer_limited', 'spammer_warn', 'tos_warn', 'locked']
+FRAUD_TYPES = ['fraudster_event', 'fraudster', 'fraudster_att']
+BASE_TIME = 1350000000
+
+
+def _sentence(rng, n_words):
+    words = [WORDS[i] for i in rng.randint(0, len(WORDS), n_words)]
+    if rng.rand() < .1:
+        words = [w.upper() for w in words]
+    words[0] = words[0].capitalize()
+    return ' '.join(words) + ('!' if rng.rand() < .2 else '.')
+
+def description(rng, n_paragraphs):
+    #HTML body with the tags and entities the text cleaner has to strip
+    paragraphs = []
+    for _ in range(n_paragraphs):
+        text = ' '.join(_sentence(rng, rng.randint(4, 16)) for _ in range(rng.randint(1, 5)))
+        if rng.rand() < .3:
+            text = '<strong>%s</strong> &amp; <a href="http://www.example.com/%d">more</a>' % (
+                text, rng.randint(1000))
+        paragraphs.append('<p>%s</p>' % text)
+    return '\r\n'.join(paragraphs)
+
+def ticket_types(rng, event_id, n):
+    tickets = []
+    for _ in range(n):
+        total = int(rng.randint(1, 500))
+        tickets.append({'availability': 1,
+                        'cost': float(rng.choice([0., 10., 25., 50., 100., 250.])),
+                        'event_id': event_id,
+                        'quantity_sold': int(rng.randint(0, total + 1)),
+                        'quantity_total': total})
+    return tickets
+
+def previous_payouts(rng, name, country, n):
+    return [{'address': '', 'amount': float(np.round(rng.gamma(2., 400.), 2)),
+             'country': country, 'created': '2012-%02d-%02d 03:00:00' % (rng.randint(1, 13), rng.randint(1, 29)),
+             'event': int(rng.randint(1000000, 9000000)), 'name': name, 'state': '',
+             'uid': int(rng.randint(1000000, 9000000)), 'zip_code': ''}
+            for _ in range(n)]
+
+def make_event(rng, object_id, fraud_rate=.09):
+    fraud = rng.rand() < fraud_rate
+    country = COUNTRIES[rng.randint(len(COUNTRIES))]
+    venue_country = country if rng.rand() < .9 else COUNTRIES[rng.randint(len(COUNTRIES))]
+    created = BASE_TIME + int(rng.randint(0, 3 * 10 ** 7))
+    start = created + int(rng.randint(86400, 90 * 86400))
+    name = _sentence(rng, rng.randint(2, 7))[:-1]
+    payee = '' if fraud and rng.rand() < .5 else 'Payee %d' % rng.randint(10000)
+    body = description(rng, rng.randint(1, 12))
+    n_payouts = 0 if fraud and rng.rand() < .7 else int(rng.poisson(8))
+    return {
+        'acct_type': FRAUD_TYPES[rng.randint(3)] if fraud else ACCT_TYPES[rng.randint(len(ACCT_TYPES))],
+        'approx_payout_date': start + 5 * 86400,
+        'body_length': len(body),
+        'channels': int(rng.choice([0, 5, 6, 8, 11, 13])),
+        'country': country,
+        'currency': CURRENCIES.get(country, 'USD'),
+        'delivery_method': [0., 1., 3., None][rng.randint(4)],
+        'description': body,
+        'email_domain': DOMAINS[rng.randint(len(DOMAINS))],
+        'event_created': created,
+        'event_end': start + int(rng.randint(3600, 86400)),
+        'event_published': created + int(rng.randint(0, 86400)) if rng.rand() < .9 else None,
+        'event_start': start,
+        'fb_published': int(rng.rand() < .15),
+        'gts': float(np.round(rng.lognormal(6., 2.), 2)) if rng.rand() < .9 else 0.,
+        'has_analytics': int(rng.rand() < .1),
+        'has_header': [0., 1., None][rng.randint(3)],
+        'has_logo': int(rng.rand() < .8),
+        'listed': 'y' if rng.rand() < .85 else 'n',
+        'name': name,
+        'name_length': len(name),
+        'num_order': int(rng.negative_binomial(1, .04)),
+        'num_payouts': n_payouts,
+        'object_id': object_id,
+        'org_desc': '' if rng.rand() < .6 else description(rng, 1),
+        'org_facebook': float(rng.randint(0, 30)) if rng.rand() < .9 else None,
+        'org_name': 'Org %d' % rng.randint(5000),
+        'org_twitter': float(rng.randint(0, 15)) if rng.rand() < .9 else None,
+        'payee_name': payee,
+        'payout_type': ['ACH', 'CHECK', ''][rng.randint(3)],
+        'previous_payouts': previous_payouts(rng, payee, country, n_payouts),
+        'sale_duration': float(rng.randint(0, 90)),
+        'sale_duration2': int(rng.randint(0, 90)),
+        'show_map': int(rng.rand() < .85),
+        'ticket_types': ticket_types(rng, object_id, int(rng.randint(1, 8))),
+        'user_age': int(rng.randint(0, 2000)) if not fraud else int(rng.randint(0, 30)),
+        'user_created': created - int(rng.randint(0, 10 ** 7)),
+        'user_type': int(rng.choice([1, 2, 3, 4, 5, 103])),
+        'venue_address': '%d Main St' % rng.randint(1, 999),
+        'venue_country': venue_country,
+        'venue_latitude': float(rng.uniform(-40, 60)),
+        'venue_longitude': float(rng.uniform(-120, 150)),
+        'venue_name': 'Venue %d' % rng.randint(2000),
+        'venue_state': 'CA',
+    }
+
+def make_events(n, seed=0, fraud_rate=.09):
+    rng = np.random.RandomState(seed)
+    return [make_event(rng, 1000000 + i, fraud_rate) for i in range(n)]
@@ -1,20 +1,58 @@
-from flask import Flask, request, render_template, jsonify
+from flask import Flask, Response, request, render_template, jsonify
+import os
 import json
+import Queue
 import requests
 import socket
 import time
 import cPickle as pickle
 import pandas as pd
-from models import data_pipeline
+from models import scoring
+from models.upstream import EventPrefetcher, fetch_event, make_session
+from models.score_cache import ScoreCache
+from models.coalescer import ScoreCoalescer
+from models.model_registry import registry
+from models.data_pipeline import FEATURE_INPUTS
+from models.metrics import metrics
+from models import text_cleaning
 from datetime import datetime
 
 #Initialize pickle app
 app = Flask(__name__)
 PORT = 8080
 
-#unpickle model
-with open('gdbr.pickle') as f:
-	model = pickle.load(f)
+#unpickle model and operating threshold once; the registry reloads
+#either one if its file changes on disk
+registry.warm([scoring.MODEL_NAME, 'operating_point'])
+
+#repeat lookups of the same object_id under the same model are served from memory
+score_cache = ScoreCache()
+
+def score_batch(events):
+	return scoring.score_events(events, cache=score_cache)
+
+#opt-in micro-batching: with FRAUDLY_COALESCE_MS set, concurrent /predict
+#and /score calls in a worker are scored together in batches of up to
+#FRAUDLY_COALESCE_MAX_BATCH events, waiting at most that many ms for a batch
+#to fill (needs a threaded server, e.g. serve.py --threaded)
+COALESCE_MS = float(os.environ.get('FRAUDLY_COALESCE_MS', 0))
+if COALESCE_MS > 0:
+	coalescer = ScoreCoalescer(score_batch, int(os.environ.get('FRAUDLY_COALESCE_MAX_BATCH', 64)),
+							   COALESCE_MS / 1000.)
+	score_events = coalescer.score
+else:
+	coalescer = None
+	score_events = score_batch
+
+def serving_version():
+	#what a score and its tier depend on; prefetched results from an older one are rescored
+	return registry.version(scoring.MODEL_NAME), registry.version('operating_point')
+
+#live events are fetched and scored ahead of time in a background thread
+#(started lazily, once per worker process)
+PREFETCH_WAIT = 0.5
+prefetcher = EventPrefetcher(score_batch, version=serving_version)
+session = make_session()
 
 #unpickle tfidf
 #with open('../tfidf.pkl') as g:
@@ -28,28 +66,122 @@ def index():
 	return render_template('index.html')
 
 @app.route('/predict')
+@metrics.timed('request_predict')
 def predict():
-	#Recieve heroku data
-	raw_data = requests.get('http://galvanize-case-study-on-fraud.herokuapp.com/data_point')
-	data = raw_data.json()
-	#Read batches of json files from NoSQL database
-
-	#read json file into dataframe
-	df = pd.Series(data, index = data.keys()).to_frame().T
-
-	#transform data through data pipeline
-	df_features = data_pipeline.feature_engineering(df)
-
-	#do model prediction
-	prediction = model.predict(df_features)
-	if prediction == 1:
+	#Take an already scored event from the prefetch queue; if none is
+	#ready in time, fetch and score one synchronously
+	try:
+		data, result = prefetcher.get(timeout=PREFETCH_WAIT)
+	except Queue.Empty:
+		metrics.incr('prefetch_misses')
+		data = fetch_event(session)
+		if not isinstance(data, dict):
+			metrics.incr('upstream_unavailable')
+			return 'Upstream data feed unavailable', 502
+		result = score_events([data])[0]
+	if result['label'] == 1:
 		message = "fraud"
 	else:
 		message = "not fraud"
 
-	return render_template('/predict.html', prediction=prediction, id=data['object_id'] ,message=message)
-
-
+	return render_template('/predict.html', prediction=result['label'], id=data['object_id'], message=message,
+						   risk=result['fraud_probability'], tier=result['risk_tier'])
+
+#largest batch one POST /score may send
+MAX_BATCH = int(os.environ.get('FRAUDLY_MAX_BATCH', 1000))
+
+def invalid_events(events, limit=20):
+	#[{index, missing}] for events that aren't objects or lack fields feature engineering needs
+	invalid = []
+	for i, event in enumerate(events):
+		if not isinstance(event, dict):
+			invalid.append({'index': i, 'error': 'event must be a JSON object'})
+		else:
+			missing = [field for field in FEATURE_INPUTS if field not in event]
+			if missing:
+				invalid.append({'index': i, 'missing': missing})
+		if len(invalid) >= limit:
+			break
+	return invalid
+
+def parse_events(body):
+	#Accept either a JSON array of events or newline-delimited JSON
+	body = body.strip()
+	if not body:
+		return []
+	if body.startswith('['):
+		return json.loads(body)
+	return [json.loads(line) for line in body.splitlines() if line.strip()]
+
+@app.route('/score', methods=['POST'])
+@metrics.timed('request_score')
+def score():
+	#Batch scoring: POST a JSON array (or NDJSON) of events
+	try:
+		events = parse_events(request.get_data())
+	except ValueError:
+		metrics.incr('bad_requests')
+		return jsonify(error='body must be a JSON array or newline-delimited JSON'), 400
+	if not isinstance(events, list):
+		metrics.incr('bad_requests')
+		return jsonify(error='body must be a JSON array or newline-delimited JSON'), 400
+	if not events:
+		return jsonify(results=[])
+	if len(events) > MAX_BATCH:
+		metrics.incr('bad_requests')
+		return jsonify(error='at most %d events per request, got %d' % (MAX_BATCH, len(events))), 413
+	invalid = invalid_events(events)
+	if invalid:
+		metrics.incr('bad_requests')
+		return jsonify(error='events are missing fields needed for scoring', invalid=invalid), 400
+
+	return jsonify(results=score_events(events))
+
+
+
+@app.route('/healthz')
+def healthz():
+	#Liveness: the worker is up and answering requests
+	return jsonify(status='ok', pid=os.getpid())
+
+@app.route('/readyz')
+def readyz():
+	#Readiness: the serving model and operating point are loaded
+	try:
+		versions = dict((name, registry.version(name)) for name in [scoring.MODEL_NAME, 'operating_point'])
+	except (IOError, OSError, ValueError, TypeError) as e:
+		return jsonify(status='unavailable', error=str(e)), 503
+	return jsonify(status='ready', versions=versions)
+
+@app.route('/cache_stats')
+def cache_stats():
+	stats = score_cache.stats()
+	if coalescer is not None:
+		stats['coalescer'] = coalescer.stats()
+	return jsonify(stats)
+
+def metric_gauges():
+	#per-worker counts read at scrape time; additive, so serve.py can sum them over workers
+	cache = score_cache.stats()
+	html_cache = text_cleaning.cache_stats()
+	gauges = {'score_cache_hits': cache['hits'],
+			  'score_cache_misses': cache['misses'],
+			  'html_cache_hits': html_cache['hits'],
+			  'html_cache_misses': html_cache['misses'],
+			  'html_cache_bytes': html_cache['bytes'],
+			  'prefetch_errors': prefetcher.errors}
+	if coalescer is not None:
+		stats = coalescer.stats()
+		gauges['coalescer_batches'] = stats['batches']
+		gauges['coalescer_events'] = stats['events']
+		gauges['coalescer_failed_batches'] = stats['failed_batches']
+	return gauges
+
+@app.route('/metrics')
+def metrics_text():
+	#Prometheus scrape target: per-stage latency histograms and counters, summed
+	#over all workers when serve.py has them share their metrics
+	return Response(metrics.prometheus(metric_gauges()), mimetype='text/plain; version=0.0.4')
 
 @app.route('/about_us')
 def about_us():
@@ -58,5 +190,5 @@ def about_us():
 if __name__ == '__main__':
     
 
-    # Start Flask app
+    # Start Flask app (development server; use serve.py in production)
     app.run(host='0.0.0.0', port=PORT, debug=True)
\ No newline at end of file
@@ -1,8 +1,13 @@
 # profit curves
+import os
+import sys
 import numpy as np 
 import cPickle as pickle
 import pandas as pd
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models'))
+from profit import profit_curve as fast_profit_curve
+
 # confusion matrix:
 
 def conf_matrix(y_true,y_predict):
@@ -15,13 +20,10 @@ def conf_matrix(y_true,y_predict):
     return np.array([[tp, fp],[fn,tn]])
 
 def profit_curve(cb, predict_probas, labels):
-    profits = []
     thresholds = np.unique(predict_probas)
-    Perc_Pred_Pos = []
-    for threshold in thresholds:
-        profits.append(float((cb*conf_matrix(labels, predict_probas>threshold)).sum())/len(predict_probas))
-        Perc_Pred_Pos.append((predict_probas>threshold).sum()/len(predict_probas))
-    return profits[::-1]
+    _, profits, Perc_Pred_Pos = fast_profit_curve(cb, predict_probas, labels,
+                                                  thresholds=thresholds, strict=True)
+    return list(profits[::-1])
 
 def plot_profit_curve(model, label, costbenefit, X_test, y_test):
     
@@ -49,7 +51,7 @@ if __name__ == '__main__':
 	# cost-benefit matrix
 	cb_matrix = np.array([[tp, fp],[fn,tn]])
 	with open('data/model.pkl') as f:
-	model = pickle.load(f)
+		model = pickle.load(f)
 	plot_profit_curve(model,'model',cb_matrix, X_test, y_test)
 	
 	
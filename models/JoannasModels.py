@@ -1,3 +1,4 @@
+import os
 import numpy as np
 import pandas as pd
 from sklearn.cross_validation import train_test_split, cross_val_score
@@ -9,6 +10,10 @@ import matplotlib.pyplot as plt
 import data_pipeline
 import cPickle as pickle
 from data_pipeline import get_data, feature_engineering, get_tix, scale_data
+from feature_store import FeatureStore
+import profit
+import training
+from model_registry import registry
 import seaborn as sb
 
 def random_forrest_class_balence(scaler_train, scaler_test):
@@ -68,19 +73,13 @@ def gdbr(scaler_train, scaler_test):
     return gdbr, cm
 
 def cross_val(estimator, train_x, train_y):
-    # n_jobs=-1 uses all the cores on your machine
-    mse = cross_val_score(estimator, train_x, train_y,
-                           scoring='mean_squared_error',
-                           cv=5) * -1
-    r2 = cross_val_score(estimator, train_x, train_y,
-                           scoring='r2', cv=5)
-
-    mean_mse = mse.mean()
-    mean_r2 = r2.mean()
-    params = estimator.get_params()
+    # each fold is fit once and scored on every metric; folds run in parallel
     name = estimator.__class__.__name__
-    print '%s Train CV | MSE: %.3f | R2: %.3f' % (name, mean_mse, mean_r2)
-    return mean_mse, mean_r2
+    results = training.evaluate_models({name: estimator}, train_x, train_y)
+    scores = training.summarize(results).loc[name]
+    print '%s Train CV | precision: %.3f | recall: %.3f | F1: %.3f | AUC: %.3f | profit: %.3f' % (
+        name, scores['precision'], scores['recall'], scores['f1'], scores['auc'], scores['profit'])
+    return scores
 
 def plot_feature_importance():
     indices = np.argsort(gdbr.feature_importances_)
@@ -94,8 +93,11 @@ def plot_feature_importance():
     plt.show()
 
 def save_to_pickle(filename, model):
-    with open(filename, 'w') as f:
+    #Write to a temp file and rename, so a running app never loads half a pickle
+    tmp = filename + '.tmp'
+    with open(tmp, 'wb') as f:
         pickle.dump(model, f)
+    os.rename(tmp, filename)
 
 
 def standard_confusion_matrix(y_true, y_predict):
@@ -103,15 +105,9 @@ def standard_confusion_matrix(y_true, y_predict):
     return np.array([[tp, fp], [fn, tn]])
 
 def profit_curve(cost_benefit_matrix, probabilities, y_true):
-    thresholds = sorted(probabilities)
-    thresholds.append(1.0)
-    profits = []
-    for threshold in thresholds:
-        y_predict = probabilities >= threshold
-        confusion_mat = standard_confusion_matrix(y_true, y_predict)
-        profit = np.sum(confusion_mat * cost_benefit_matrix) / float(len(y_true))
-        profits.append(profit)
-    return thresholds, profits
+    # one sort + cumulative sums instead of a confusion matrix per threshold
+    thresholds, profits, _ = profit.profit_curve(cost_benefit_matrix, probabilities, y_true)
+    return list(thresholds), profits
 
 def run_profit_curve(model, costbenefit, X_train, X_test, y_train, y_test):
     model.fit(X_train, y_train)
@@ -155,16 +151,19 @@ if __name__ == '__main__':
     columns = ['has_previous_payouts', 'gts_is_0', 'gts_less_10', 'gts_less_25', 'venue_outside_user_country', 'num_tix_total', 'num_tix_sold_by_event', 'num_payouts', 'email_gmail', 'email_yahoo', 'email_hotmail','email_aol','email_com', 'email_org', 'email_edu','approx_payout_date', 'sale_duration2', 'num_order', 'body_length', 'high_fraud_country', 'exclamation_points']
 
 
-    x_feature_train = feature_engineering(X1_train)
-    x_feature_test = feature_engineering(x1_test)
+    # features come from the on-disk store; only new or changed events are recomputed
+    store = FeatureStore()
+    x_feature_train = store.features(X1_train.assign(fraud=y1_train))
+    x_feature_test = store.features(x1_test.assign(fraud=y1_test))
 
     scaler_train, scaler_test = scale_data(x_feature_train, x_feature_test)
 
     rf2, cm_rf = random_forrest_class_balence(scaler_train, scaler_test)
     gdbr, cm_gdbr = gdbr(scaler_train, scaler_test)
 
-    cross_val(rf2, scaler_train, y1_train)
-    cross_val(gdbr, scaler_train, y1_train)
+    cv_results = training.evaluate_models({'rf': rf2, 'gdbr': gdbr}, scaler_train, y1_train,
+                                          results_path='cv_results.csv')
+    print training.summarize(cv_results)
 
     plot_feature_importance()
 
@@ -173,3 +172,14 @@ if __name__ == '__main__':
     plot_profit_models(models, costbenefit, scaler_train, scaler_test, y1_train, y1_test)
     print find_best_threshold(models, costbenefit,
                              scaler_train, scaler_test, y1_train, y1_test)
+
+    # this gdbr is fit on scaled features, so it is not a drop-in for the
+    # served gdbr.pickle; keep it and the thresholds tuned for it together,
+    # away from the live artifacts (tune_threshold.py retunes the live model)
+    candidate = os.path.join('candidates', 'gdbr_scaled.pickle')
+    if not os.path.isdir('candidates'):
+        os.makedirs('candidates')
+    save_to_pickle(candidate, gdbr)
+    point = profit.operating_point(costbenefit, gdbr.predict_proba(scaler_test)[:, 1], y1_test)
+    profit.save_operating_point(profit.operating_point_path(candidate), point)
+    print point
@@ -11,9 +11,8 @@ from sklearn.cross_validation import KFold
 from statsmodels.api import Logit
 from sklearn.metrics import accuracy_score, precision_score, recall_score
 
-from data_pipeline import get_data, replace_delivery_nans
-
-from smote import smote
+from data_pipeline import get_data, replace_delivery_nans, smote
+from nested import ticket_features, payout_features
 
 df = pd.read_json('../fraud-detection-case-study/data/data.json')
 X_train, X_test, y_train, y_test = fraudColumn_and_split(df)
@@ -24,31 +23,14 @@ X_train['email_com'] = (X_train.email_domain[-3:] == "com").astype(int)
 X_train['email_org'] = (X_train.email_domain[-3:] == "org").astype(int)
 X_train['email_edu'] = (X_train.email_domain[-3:] == "edu").astype(int)
 
-X_train['num_payouts'] = X_train.previous_payouts.apply(lambda x: len(x))
+X_train['num_payouts'] = payout_features(X_train.previous_payouts)['num_payouts']
 X_train['venue_country!=country']= (X_train['country']!=X_train['venue_country']).astype(int)
 
-def revenue(x):
-	tot_revenue = 0
-	for item in x:
-		tot_revenue += item['cost']*item['quantity_sold']
-	return tot_revenue
-
-def expected_revenue(x):
-	tot_revenue = 0
-	for item in x:
-		tot_revenue += item['cost']*item['quantity_total']
-	return tot_revenue
-
-def get_tix(ticket_types, value):
-	total = 0
-	for ticket in ticket_types:
-		total += ticket[value]
-	return total
-
-X_train['actual_revenue'] = X_train.ticket_types.apply(revenue)
-X_train['expected_revenue'] = X_train.ticket_types.apply(expected_revenue)
-X_train['num_tix_total'] = X_train.ticket_types.apply(get_tix, args=("quantity_total",))
-X_train['num_tix_sold_by_event'] = X_train.ticket_types.apply(get_tix, args=("quantity_sold",))	
+tickets = ticket_features(X_train.ticket_types)
+X_train['actual_revenue'] = tickets['revenue']
+X_train['expected_revenue'] = tickets['expected_revenue']
+X_train['num_tix_total'] = tickets['num_tix_total']
+X_train['num_tix_sold_by_event'] = tickets['num_tix_sold_by_event']
 	# previous tix sold (from previous_payouts)
 
 # further division
@@ -1,7 +1,7 @@
 import cPickle as pickle
 import numpy as np
 import pandas as pd
-from bs4 import BeautifulSoup
+from text_cleaning import clean_column
 
 from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
 from sklearn.decomposition import NMF
@@ -13,12 +13,8 @@ from sklearn.naive_bayes import MultinomialNB
 
 
 def build_pickle(df):
-   #CLEAN HTML FUNCTION
-   def get_text(cell):
-       return BeautifulSoup(cell, 'html.parser').get_text()
-
-   #Parse descriptions using html function above:
-   df['description'] = df['description'].apply(get_text)
+   #Parse descriptions out of their html
+   df['description'] = clean_column(df['description'])
    clean = df['description']
 
    #All the parameters for the topic modeling.
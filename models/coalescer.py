@@ -0,0 +1,127 @@
+import os
+import time
+import Queue
+import threading
+
+
+class _Request(object):
+    #One caller's events, and the slot its results are handed back in
+    __slots__ = ('events', 'results', 'error', 'done')
+
+    def __init__(self, events):
+        self.events = events
+        self.results = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class ScoreCoalescer(object):
+    '''
+    Micro-batches concurrent scoring calls into a single call to `score`
+    (a list of events -> list of results, e.g. scoring.score_events).
+
+    score(events) queues the caller's events and blocks. A background
+    thread takes the first waiting request, then keeps collecting requests
+    until it holds max_batch events or max_wait seconds have passed since
+    the first one arrived. It scores them all with one feature_engineering +
+    predict_proba pass and hands each caller back its own slice of the
+    results. If the batch fails (say one caller sent a malformed event),
+    each request in it is rescored on its own, so only the callers whose
+    events fail get the exception, as they would without coalescing.
+
+    With one request in flight this adds at most max_wait to its latency.
+    Under concurrent load the per-call pandas / sklearn overhead is paid
+    once per batch instead of once per request.
+
+    Like EventPrefetcher, the thread is started lazily, once per process,
+    so it also works after a pre-fork server forks.
+    '''
+
+    def __init__(self, score, max_batch=64, max_wait=0.005):
+        self.score_batch = score
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.events = 0
+        self.failed_batches = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = Queue.Queue()
+            self._thread = threading.Thread(target=self._run, name='score-coalescer')
+            self._thread.daemon = True
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def score(self, events, timeout=None):
+        #Results for `events`, scored together with whatever else is waiting
+        if not events:
+            return []
+        self.start()
+        request = _Request(list(events))
+        self.queue.put(request)
+        if not request.done.wait(timeout):
+            raise RuntimeError('scoring did not finish within %.3fs' % timeout)
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    def stats(self):
+        return {'batches': self.batches, 'events': self.events,
+                'failed_batches': self.failed_batches,
+                'mean_batch': self.events / float(self.batches) if self.batches else 0.}
+
+    def _collect(self):
+        #Block for one request, then gather more until the batch is full or max_wait is up
+        batch = [self.queue.get()]
+        size = len(batch[0].events)
+        deadline = time.time() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                request = self.queue.get(timeout=remaining)
+            except Queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.events)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            events = [event for request in batch for event in request.events]
+            try:
+                results = self.score_batch(events)
+            except Exception as e:
+                self.failed_batches += 1
+                if len(batch) == 1:
+                    batch[0].error = e
+                    batch[0].done.set()
+                else:
+                    self._score_each(batch)
+                continue
+            self.batches += 1
+            self.events += len(events)
+            start = 0
+            for request in batch:
+                stop = start + len(request.events)
+                request.results = results[start:stop]
+                start = stop
+                request.done.set()
+
+    def _score_each(self, batch):
+        #Fallback for a failed batch: one score call per request
+        for request in batch:
+            try:
+                request.results = self.score_batch(request.events)
+            except Exception as e:
+                request.error = e
+            request.done.set()
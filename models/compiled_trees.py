@@ -0,0 +1,133 @@
+import sys
+import cPickle as pickle
+import numpy as np
+
+BATCH_ROWS = 10000
+# binomial deviance; the only GBM loss whose probability is sigmoid(raw score)
+GBM_LOSSES = ('deviance', 'log_loss')
+
+
+def _flatten(trees, leaf_values):
+    '''
+    Concatenate every tree's node arrays into flat arrays. Child indices are
+    offset to point into the flat arrays, and leaves point at themselves,
+    so walking max_depth steps from each root always ends on a leaf.
+    '''
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset = 0
+    depth = 0
+    for tree in trees:
+        t = tree.tree_
+        nodes = np.arange(t.node_count) + offset
+        leaf = t.children_left == -1
+        roots.append(offset)
+        feature.append(np.where(leaf, 0, t.feature))
+        threshold.append(t.threshold)
+        left.append(np.where(leaf, nodes, t.children_left + offset))
+        right.append(np.where(leaf, nodes, t.children_right + offset))
+        value.append(leaf_values(t))
+        offset += t.node_count
+        depth = max(depth, t.max_depth)
+    return {'feature': np.concatenate(feature).astype(np.int32),
+            'threshold': np.concatenate(threshold).astype(np.float64),
+            'left': np.concatenate(left).astype(np.int32),
+            'right': np.concatenate(right).astype(np.int32),
+            'value': np.concatenate(value).astype(np.float64),
+            'roots': np.array(roots, dtype=np.int32),
+            'depth': np.int32(depth)}
+
+
+def _n_features(model):
+    #n_features_ was renamed n_features_in_ in later sklearn releases
+    return getattr(model, 'n_features_in_', None) or model.n_features_
+
+
+class CompiledEnsemble(object):
+    '''
+    A GradientBoostingClassifier or RandomForestClassifier flattened into
+    contiguous NumPy arrays, evaluated for a whole batch at once. Gives the
+    same probabilities as the sklearn model it came from.
+
+    kind is 'gbm' (probability = sigmoid(base + sum of leaf values)) or
+    'rf' (probability = mean of the trees' leaf fraud fractions).
+    '''
+
+    def __init__(self, kind, arrays, base, n_features, classes):
+        self.kind = kind
+        self.arrays = arrays
+        self.base = float(base)
+        self.n_features = int(n_features)
+        self.classes_ = np.asarray(classes)
+
+    @classmethod
+    def from_model(cls, model):
+        name = model.__class__.__name__
+        if name == 'GradientBoostingClassifier':
+            if len(model.classes_) != 2:
+                raise ValueError('only binary GradientBoostingClassifier is supported')
+            if model.loss not in GBM_LOSSES:
+                raise ValueError('cannot compile a GradientBoostingClassifier with loss=%r; '
+                                 'only binomial deviance is supported' % (model.loss,))
+            trees = model.estimators_[:, 0]
+            lr = model.learning_rate
+            arrays = _flatten(trees, lambda t: lr * t.value[:, 0, 0])
+            # the init estimator's raw score, recovered from one row
+            X0 = np.zeros((1, _n_features(model)), dtype=np.float32)
+            base = (np.ravel(model.decision_function(X0))[0] -
+                    lr * sum(tree.predict(X0)[0] for tree in trees))
+            return cls('gbm', arrays, base, _n_features(model), model.classes_)
+        if name == 'RandomForestClassifier':
+            def fraud_fraction(t):
+                counts = t.value[:, 0, :]
+                return counts[:, 1] / counts.sum(axis=1)
+            arrays = _flatten(model.estimators_, fraud_fraction)
+            return cls('rf', arrays, 0., _n_features(model), model.classes_)
+        raise TypeError('cannot compile a %s' % name)
+
+    def _leaf_sums(self, X):
+        a = self.arrays
+        rows = np.arange(len(X))[:, None]
+        nodes = np.tile(a['roots'], (len(X), 1))
+        for _ in range(a['depth']):
+            go_left = X[rows, a['feature'][nodes]] <= a['threshold'][nodes]
+            nodes = np.where(go_left, a['left'][nodes], a['right'][nodes])
+        return a['value'][nodes].sum(axis=1)
+
+    def predict_proba(self, X):
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError('expected %d features, got shape %s' % (self.n_features, X.shape))
+        sums = np.concatenate([self._leaf_sums(X[i:i + BATCH_ROWS])
+                               for i in range(0, len(X), BATCH_ROWS)] or [np.empty(0)])
+        if self.kind == 'gbm':
+            p = 1. / (1. + np.exp(-(self.base + sums)))
+        else:
+            p = sums / len(self.arrays['roots'])
+        return np.column_stack([1 - p, p])
+
+    def predict(self, X):
+        return self.classes_.take((self.predict_proba(X)[:, 1] > .5).astype(int))
+
+    def save(self, path):
+        np.savez(path, kind=self.kind, base=self.base, n_features=self.n_features,
+                 classes=self.classes_, **self.arrays)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        arrays = dict((k, data[k]) for k in ['feature', 'threshold', 'left', 'right',
+                                             'value', 'roots', 'depth'])
+        arrays['depth'] = int(arrays['depth'])
+        return cls(str(data['kind']), arrays, data['base'], data['n_features'], data['classes'])
+
+
+def export(pickle_path, out_path):
+    with open(pickle_path, 'rb') as f:
+        compiled = CompiledEnsemble.from_model(pickle.load(f))
+    compiled.save(out_path)
+    return compiled
+
+if __name__ == '__main__':
+    # python compiled_trees.py ../gdbr.pickle ../gdbr.npz
+    export(sys.argv[1], sys.argv[2])
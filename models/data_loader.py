@@ -0,0 +1,74 @@
+import json
+import pandas as pd
+from data_pipeline import DATA_COLUMNS, add_fraud_label, feature_engineering
+
+READ_SIZE = 1 << 20
+WHITESPACE = ' \t\r\n'
+
+
+def iter_records(path, read_size=READ_SIZE):
+    '''
+    Yield events one dict at a time from either a JSON array file (like
+    data/data.json) or a JSON-lines file, without loading the whole file.
+    Only the current read buffer and the event being decoded are in memory.
+    '''
+    with open(path, 'rb') as f:
+        buf = f.read(read_size)
+        start = buf.lstrip(WHITESPACE)[:1]
+        if start != '[':
+            f.seek(0)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        decoder = json.JSONDecoder()
+        pos = buf.index('[') + 1
+        eof = False
+        while True:
+            # skip separators between events
+            while pos < len(buf) and buf[pos] in WHITESPACE + ',':
+                pos += 1
+            if pos < len(buf) and buf[pos] == ']':
+                return
+            try:
+                if pos >= len(buf):
+                    raise ValueError('need more data')
+                record, pos = decoder.raw_decode(buf, pos)
+            except ValueError:
+                # event straddles the buffer: drop what we've used, read more
+                if eof:
+                    raise ValueError('truncated JSON array in %s' % path)
+                more = f.read(read_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+            yield record
+
+def iter_chunks(path, chunksize=10000, columns=DATA_COLUMNS, label=True):
+    '''
+    Yield DataFrames of at most `chunksize` events holding only `columns`
+    (plus acct_type and the derived fraud column when label=True).
+    '''
+    keep = list(columns) + (['acct_type'] if label else [])
+    rows = []
+    for record in iter_records(path):
+        rows.append(dict((column, record.get(column)) for column in keep))
+        if len(rows) >= chunksize:
+            yield _to_frame(rows, keep, label)
+            rows = []
+    if rows:
+        yield _to_frame(rows, keep, label)
+
+def iter_features(path, chunksize=10000, **kwargs):
+    #Yield (features, fraud labels) chunk by chunk, ready for a model
+    for chunk in iter_chunks(path, chunksize):
+        y = chunk['fraud']
+        yield feature_engineering(chunk.drop(['fraud', 'acct_type'], axis=1), **kwargs), y
+
+def _to_frame(rows, columns, label):
+    df = pd.DataFrame(rows, columns=columns)
+    if label:
+        df = add_fraud_label(df)
+    return df
@@ -8,25 +8,14 @@ from sklearn.feature_extraction import text
 from numpy.linalg import lstsq
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.decomposition import NMF
-from bs4 import BeautifulSoup
-from collections import Counter
-import string
+from model_registry import registry
+from text_cleaning import clean_column
+import text_stats
+import nested
+from metrics import metrics
 
 
-def get_data():
-	df = pd.read_json('data/data.json')
-
-	#Create binary fraud column
-	df['fraud'] = 0
-	df.loc[df['acct_type'] == 'fraudster_event', 'fraud'] = 1
-	df.loc[df['acct_type'] == 'fraudster', 'fraud'] = 1
-	df.loc[df['acct_type'] == 'fraudster_att', 'fraud'] = 1
-	#Check
-	# print "Should be 1293, it is... "+ sum(df['fraud'])
-
-	#Train, test, split
-	y = df['fraud']
-	X = df[[         u'approx_payout_date',        u'body_length',
+DATA_COLUMNS = [         u'approx_payout_date',        u'body_length',
 		     u'channels',            u'country',           u'currency',
 	      u'delivery_method',        u'description',       u'email_domain',
 		u'event_created',          u'event_end',    u'event_published',
@@ -40,23 +29,71 @@ def get_data():
 		     u'show_map',       u'ticket_types',           u'user_age',
 		 u'user_created',          u'user_type',      u'venue_address',
 		u'venue_country',     u'venue_latitude',    u'venue_longitude',
-		   u'venue_name',        u'venue_state',              ]]
+		   u'venue_name',        u'venue_state',              ]
+
+FRAUD_ACCT_TYPES = ['fraudster_event', 'fraudster', 'fraudster_att']
+
+
+def get_data(path='data/data.json', chunksize=10000):
+	#Streamed through data_loader.iter_chunks: only DATA_COLUMNS and acct_type
+	#of each event are kept, never the whole parsed file
+	from data_loader import iter_chunks  # data_loader imports this module
+	df = pd.concat(iter_chunks(path, chunksize), ignore_index=True)
+
+	#iter_chunks adds the binary fraud column
+	#Check
+	# print "Should be 1293, it is... "+ sum(df['fraud'])
+
+	#Train, test, split
+	y = df['fraud']
+	X = df[DATA_COLUMNS]
 
 	X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=.3, random_state=1234)
 	return X_train, X_test, y_train, y_test
 
+def add_fraud_label(df):
+	#fraudster_event, fraudster and fraudster_att are all fraud
+	df['fraud'] = df['acct_type'].isin(FRAUD_ACCT_TYPES).astype(int)
+	return df
+
 
-def feature_engineering(df):
+FRAUDY_COUNTRIES = frozenset([u'A1', u'AR', u'BG', u'CH', u'CI', u'CM', u'CN', u'CO', u'CZ', u'DE', u'DK', u'DZ', u'FI', u'HR', u'ID', u'IL', u'JE', u'JM', u'KH', u'MA', u'MY', u'NA', u'NG', u'PH', u'PK', u'PR', u'PS', u'QA', u'RU', u'TR', u'VN'])
 
-	# are there any previous payouts?
 
-	df['has_previous_payouts'] = df.previous_payouts.apply(lambda x: int(x == []))
+# Bump whenever feature_engineering (or the nested / text_stats /
+# text_cleaning helpers it calls) starts producing different values. The
+# feature store and the score cache are keyed on it, so a bump recomputes
+# stored features and drops cached scores; edits that leave the output
+# unchanged (timers, refactors, other functions in these modules) don't.
+FEATURE_VERSION = '1'
+
+# raw fields feature_engineering reads; an event without any of them can't be scored
+FEATURE_INPUTS = ['approx_payout_date', 'body_length', 'country', 'description', 'email_domain',
+                  'gts', 'num_order', 'previous_payouts', 'sale_duration2', 'ticket_types',
+                  'venue_country']
+
+
+TOPICS = ['topic1', 'topic2', 'topic3', 'topic4', 'topic5', 'topic6', 'topic7', 'topic8', 'topic9']
+TOPIC_COLUMNS = ['topic_' + topic for topic in TOPICS]
+
+
+def feature_engineering(df, vectorizer=None, topic_model=None):
+
+	# ticket_types / previous_payouts flattened once, aggregated per event
+	with metrics.timer('features_nested'):
+		tickets = nested.ticket_features(df.ticket_types)
+		payouts = nested.payout_features(df.previous_payouts)
+
+	# are there any previous payouts?
+	num_payouts = payouts['num_payouts']
+	df['has_previous_payouts'] = (num_payouts == 0).astype(int)
 
 	# gts values -- binned
 
-	df['gts_is_0'] = df.gts.apply(lambda x: int(x == 0))
-	df['gts_less_10'] = df.gts.apply(lambda x: int(0 < x < 10))
-	df['gts_less_25'] = df.gts.apply(lambda x: int(10 < x < 25))
+	gts = df.gts
+	df['gts_is_0'] = (gts == 0).astype(int)
+	df['gts_less_10'] = ((gts > 0) & (gts < 10)).astype(int)
+	df['gts_less_25'] = ((gts > 10) & (gts < 25)).astype(int)
 
 	# user country != venue country
 
@@ -66,20 +103,21 @@ def feature_engineering(df):
 	#country dummies
 
 	#num of tix for sale (from ticket types)
-	df['num_tix_total'] = df.ticket_types.apply(get_tix, args=("quantity_total",))
+	df['num_tix_total'] = tickets['num_tix_total']
 	# num of tix sold (from ticket types)
-	df['num_tix_sold_by_event'] = df.ticket_types.apply(get_tix, args=("quantity_sold",))	
+	df['num_tix_sold_by_event'] = tickets['num_tix_sold_by_event']
 	# previous tix sold (from previous_payouts)
-	df['num_payouts'] = df.previous_payouts.apply(lambda x: len(x))	
+	df['num_payouts'] = num_payouts
 
 	#emails:
-	df['email_gmail'] = (df.email_domain == "gmail.com").astype(int)
-	df['email_yahoo'] = (df.email_domain == "yahoo.com").astype(int)
-	df['email_hotmail'] = (df.email_domain == "hotmail.com").astype(int)
-	df['email_aol'] = (df.email_domain == "aol.com").astype(int)
-	df['email_com'] = (df.email_domain.apply(lambda x: x[-3:]) == "com").astype(int)
-	df['email_org'] = (df.email_domain.apply(lambda x: x[-3:]) == "org").astype(int)
-	df['email_edu'] = (df.email_domain.apply(lambda x: x[-3:]) == "edu").astype(int)
+	email = df.email_domain
+	df['email_gmail'] = (email == "gmail.com").astype(int)
+	df['email_yahoo'] = (email == "yahoo.com").astype(int)
+	df['email_hotmail'] = (email == "hotmail.com").astype(int)
+	df['email_aol'] = (email == "aol.com").astype(int)
+	df['email_com'] = email.str.endswith("com").fillna(False).astype(int)
+	df['email_org'] = email.str.endswith("org").fillna(False).astype(int)
+	df['email_edu'] = email.str.endswith("edu").fillna(False).astype(int)
 
 	#fraudy countries
 	# fraud_one_sd_above = np.mean(df['fraud']) + np.std(df['fraud'])
@@ -87,35 +125,49 @@ def feature_engineering(df):
 	# high_fraud=df.groupby('country').mean()[fraud_bools]
 	# high_fraud_countries = high_fraud.index
 	# df['high_fraud_country'] = df.country.apply(lambda x: x in high_fraud_countries).astype(int)
-	fraudy_countries = [u'A1', u'AR', u'BG', u'CH', u'CI', u'CM', u'CN', u'CO', u'CZ', u'DE', u'DK', u'DZ', u'FI', u'HR', u'ID', u'IL', u'JE', u'JM', u'KH', u'MA', u'MY', u'NA', u'NG', u'PH', u'PK', u'PR', u'PS', u'QA', u'RU', u'TR', u'VN']
-	df['high_fraud_country'] = df.country.apply(lambda x: 1 if x in fraudy_countries else 0)
+	df['high_fraud_country'] = df.country.isin(FRAUDY_COUNTRIES).astype(int)
+
+	with metrics.timer('features_text'):
+		# get number of exclamation marks
+		df['exclamation_points'] = text_stats.exclamation_points(df['description'])
 
-	# get number of exclamation marks
-	df['exclamation_points'] = df['description'].apply(count_bangs)
+		# get proportion of caps
+		df['caps_proportion'] = text_stats.caps_proportion(df['description'])
 
-	# get proportion of caps
-	df['caps_proportion'] = df['description'].apply(caps_prop)
+	cols_to_keep = ['has_previous_payouts', 'gts_is_0', 'gts_less_10', 'gts_less_25', 'venue_outside_user_country', 'num_tix_total', 'num_tix_sold_by_event', 'num_payouts', 'email_gmail', 'email_yahoo', 'email_hotmail','email_aol','email_com', 'email_org', 'email_edu','approx_payout_date', 'sale_duration2', 'num_order', 'body_length', 'high_fraud_country', 'exclamation_points', 'caps_proportion']
 
 	# make columns according to topics from naive bayes classifier
-	# df = topic_dummies(df)
-	for i in range(df.shape[0]): 
-		df.iloc[i,:]['topic']
+	# (optional: only when a fitted vectorizer and topic model are passed in)
+	if vectorizer is not None and topic_model is not None:
+		with metrics.timer('features_topics'):
+			df = topic_features(df, vectorizer, topic_model)
+		cols_to_keep = cols_to_keep + TOPIC_COLUMNS
 
-	cols_to_keep = ['has_previous_payouts', 'gts_is_0', 'gts_less_10', 'gts_less_25', 'venue_outside_user_country', 'num_tix_total', 'num_tix_sold_by_event', 'num_payouts', 'email_gmail', 'email_yahoo', 'email_hotmail','email_aol','email_com', 'email_org', 'email_edu','approx_payout_date', 'sale_duration2', 'num_order', 'body_length', 'high_fraud_country', 'exclamation_points', 'caps_proportion']
 	return df[cols_to_keep]
 
+def topic_features(df, vectorizer, topic_model):
+	'''
+	Add one topic_* dummy column per topic, using a single batched
+	vectorizer.transform + topic_model.predict over the whole frame.
+	vectorizer and topic_model are the pair returned by build_pickle.
+	'''
+	clean_text = clean_column(df['description'])
+	topics = topic_model.predict(vectorizer.transform(clean_text))
+
+	# fixed categories so every batch gets all nine columns, in order
+	topics = pd.Categorical(topics, categories=TOPICS)
+	dummies = pd.get_dummies(topics).rename(columns=lambda x: 'topic_' + str(x))
+	dummies.index = df.index
+	return pd.concat([df, dummies], axis=1)
+
+
 def predict(one_line):
    #Expects one line df of new data
 
-   def get_text(cell):
-       return BeautifulSoup(cell, 'html.parser').get_text()
+   clean_text = clean_column(one_line['description'])
 
-   clean_text = one_line['description'].apply(get_text)
-
-   with open('vectorizer3.pkl') as f:
-       vectorizer = pickle.load(f)
-   with open('model3.pkl') as f:
-       model = pickle.load(f)
+   vectorizer = registry.get('vectorizer')
+   model = registry.get('topic_model')
 
    def make_prediction(text):
        if not text.empty:
@@ -133,16 +185,6 @@ def predict(one_line):
    return one_line
 
 
-def count_bangs(description_string):
-   char_count = Counter(description_string)
-   return char_count['!']
-
-def caps_prop(description_string):
-   if description_string:
-       return len(filter(lambda x: x in string.uppercase, description_string))/len(description_string)
-   else:
-   		return .045 #this is the mean of the values from the training set
-
 def scale_data(x_train, x_test):
 	scaler = preprocessing.StandardScaler()
 	scaler.fit(x_train)
@@ -171,96 +213,53 @@ def get_tix(ticket_types, value):
 		total += ticket[value]
 	return total
 
-def smote(X, y, target, k=None):
+def smote(X, y, target, k=5, random_state=None, chunksize=100000):
 	"""
 	INPUT:
 	X, y - your data
 	target - the percentage of positive class 
 	     observations in the output
 	k - k in k nearest neighbors
+	random_state - seed for the synthetic draws
+	chunksize - synthetic rows interpolated per vectorized step
 	OUTPUT:
 	X_oversampled, y_oversampled - oversampled data
 	`smote` generates new observations from the positive (minority) class:
 	For details, see: https://www.jair.org/media/953/live-953-2037-jair.pdf
-	# """
-	# if target <= sum(y)/float(len(y)):
-	# 	return X, y
-	# if k is None:
-	# k = len(X)**.5
-	# # fit kNN model
-	# knn = KNeighborsClassifier(n_neighbors=k)
-	# knn.fit(X[y==1], y[y==1])
-	# neighbors = knn.kneighbors()[0]
-	# positive_observations = X[y==1]
-	# # determine how many new positive observations to generate
-	# positive_count = sum(y)
-	# negative_count = len(y) - positive_count
-	# target_positive_count = target*negative_count / (1. - target)
-	# target_positive_count = int(round(target_positive_count))
-	# number_of_new_observations = target_positive_count - positive_count
-	# # generate synthetic observations
-	# synthetic_observations = np.empty((0, X.shape[1]))
-	# while len(synthetic_observations) < number_of_new_observations:
-	# obs_index = np.random.randint(len(positive_observations))
-	# observation = positive_observations[obs_index]
-	# neighbor_index = np.random.choice(neighbors[obs_index])
-	# neighbor = X[neighbor_index]
-	# obs_weights = np.random.random(len(neighbor))
-	# neighbor_weights = 1 - obs_weights
-	# new_observation = obs_weights*observation + neighbor_weights*neighbor
-	# synthetic_observations = np.vstack((synthetic_observations, new_observation))
-
-	# X_smoted = np.vstack((X, synthetic_observations))
-	# y_smoted = np.concatenate((y, [1]*len(synthetic_observations)))
-
-	# return X_smoted, y_smoted
-	pass
-
-
-def smote2(X, y, target, k=None):
+	Each synthetic point lies a random fraction of the way from a positive
+	observation to one of its k nearest positive neighbors. The random
+	choices (base row, neighbor, gap) are drawn for every new point up front,
+	so the output depends on random_state alone, not on chunksize; the
+	output is allocated once and filled chunk by chunk.
 	"""
-	INPUT:
-	X, y - your data
-	target - the percentage of positive class 
-	     observations in the output
-	k - k in k nearest neighbors
-	OUTPUT:
-	X_oversampled, y_oversampled - oversampled data
-	`smote` generates new observations from the positive (minority) class:
-	For details, see: https://www.jair.org/media/953/live-953-2037-jair.pdf
-	"""
-	'''
-	y_zeros = y[y==0]
-	X_zeros = X[y==0]
-	y_ones = y[y==1]
-	X_ones = X[y==1]
-	if len(y_ones) > len(y_zeros):
-	y_minority = y_zeros
-	X_minority = X_zeros
-	else:
-	y_minority = y_ones
-	X_minority = X_ones
-	# fit a KNN model    
-	# This has to be called on the minority bunch only!!!!!    
-	nbrs = NearestNeighbors(n_neighbors=k, algorithm='ball_tree').fit(X_minority)
-	distances, indices = nbrs.kneighbors(X_minority)
-	# determine how many new positive observations to generate    
-	target = float(target)    
-	N_new_data = (len(y)*target - len(y_minority))/(1-target)
-	# adding to the zeros
-	ind_new = np.random.randint(0,len(y_minority),N_new_data)
-	# generate synthetic observations
-	y_synth = np.zeros(len(N_new_data))
-	X_synth = []        
-	for value in ind_new:
-	r = np.random(0, k)           
-	neighbor_index = indices[value, r]
-	distances = np.random.random(0, 1, len(X_minority.columns))            
-	new_point = X_minority[value] + distances*(X_minority[value]-X_minority[neighbor_index])            
-	X_synth.append = new_point
-	# combine synthetic observations with original observations
-	X_smoted = np.concatenate((X_ones, X_zeros, X_synth),axis=1)
-	y_smoted = np.concatenate((y_ones, y_zeros, y_synth),axis=1)
+	X = np.asarray(X, dtype=float)
+	y = np.asarray(y)
+	positive_observations = X[y == 1]
+	positive_count = len(positive_observations)
+	negative_count = len(y) - positive_count
+	if positive_count < 2 or target <= positive_count / len(y):
+		return X, y
+
+	# determine how many new positive observations to generate
+	target_positive_count = int(round(target * negative_count / (1. - target)))
+	number_of_new_observations = target_positive_count - positive_count
+
+	# fit kNN on the positive class only; drop each point's match with itself
+	k = min(k, positive_count - 1)
+	nbrs = NearestNeighbors(n_neighbors=k + 1).fit(positive_observations)
+	neighbors = nbrs.kneighbors(positive_observations, return_distance=False)[:, 1:]
+
+	X_smoted = np.empty((len(X) + number_of_new_observations, X.shape[1]))
+	X_smoted[:len(X)] = X
+	rng = np.random.RandomState(random_state)
+	obs_index = rng.randint(positive_count, size=number_of_new_observations)
+	neighbor_index = neighbors[obs_index, rng.randint(k, size=number_of_new_observations)]
+	gap = rng.random_sample((number_of_new_observations, 1))
+	for start in range(0, number_of_new_observations, chunksize):
+		rows = slice(start, start + chunksize)
+		observation = positive_observations[obs_index[rows]]
+		X_smoted[len(X) + start:len(X) + start + len(observation)] = (
+			observation + gap[rows] * (positive_observations[neighbor_index[rows]] - observation))
+
+	y_smoted = np.concatenate((y, np.ones(number_of_new_observations, dtype=y.dtype)))
 	return X_smoted, y_smoted
-	'''
-	pass
\ No newline at end of file
@@ -0,0 +1,108 @@
+import os
+import pandas as pd
+try:
+    from pyarrow import feather
+except ImportError:
+    # optional: pyarrow has no Python 2 builds after 0.16; without it the
+    # store is a pandas pickle, which needs nothing beyond pandas
+    feather = None
+
+from data_pipeline import FEATURE_INPUTS, feature_engineering
+from model_registry import ROOT_DIR
+from versioning import feature_version, object_version, raw_hash
+
+DEFAULT_ROOT = os.path.join(ROOT_DIR, 'data', 'features')
+KEY_COLUMNS = ['object_id', 'raw_hash']
+
+
+def row_hashes(df):
+    #Content hash of each event's feature inputs, to spot changed events
+    columns = [c for c in FEATURE_INPUTS if c in df.columns]
+    return pd.Series([raw_hash(r) for r in df[columns].to_dict('records')], index=df.index)
+
+
+class FeatureStore(object):
+    '''
+    Columnar cache of feature_engineering output, keyed by object_id and
+    the hash of each event's raw fields. One file per feature version, and
+    per topic model when topic features are included:
+    data/features/features-<version>[-topics-<topic version>].feather.
+
+    The .feather files need pyarrow (0.16 is the last release with Python 2
+    wheels) and are memory-mapped, so load(columns) reads only those
+    columns. Without pyarrow the store falls back to a pandas pickle,
+    features-<version>.pkl, which has to be read whole on every load and
+    rewritten whole on every update: fine for data.json-sized stores, slow
+    beyond that.
+    '''
+
+    def __init__(self, root=DEFAULT_ROOT, version=None):
+        self.root = root
+        self.version = version or feature_version()
+
+    @property
+    def path(self):
+        return self.path_for()
+
+    def path_for(self, vectorizer=None, topic_model=None):
+        #Store file for features computed with this vectorizer / topic model (none: no topic columns)
+        name = 'features-%s' % self.version
+        if vectorizer is not None and topic_model is not None:
+            name += '-topics-%s' % object_version((vectorizer, topic_model))
+        extension = 'feather' if feather is not None else 'pkl'
+        return os.path.join(self.root, '%s.%s' % (name, extension))
+
+    def load(self, columns=None, vectorizer=None, topic_model=None):
+        #Stored features (empty frame if none yet)
+        path = self.path_for(vectorizer, topic_model)
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=KEY_COLUMNS)
+        if feather is None:
+            df = pd.read_pickle(path)
+            return df[columns] if columns is not None else df
+        return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+    def load_matrix(self, vectorizer=None, topic_model=None):
+        #Stored feature matrix and label, for training / threshold tuning
+        df = self.load(vectorizer=vectorizer, topic_model=topic_model)
+        y = df.pop('fraud').astype(int) if 'fraud' in df.columns else None
+        return df.drop(KEY_COLUMNS, axis=1), y
+
+    def features(self, df, vectorizer=None, topic_model=None):
+        '''
+        Features for every row of the raw frame `df`, aligned to its index,
+        with topic columns when a vectorizer and topic model are passed.
+        Only events that are new, or whose raw fields changed, go through
+        feature_engineering; the store is then rewritten with them.
+        '''
+        path = self.path_for(vectorizer, topic_model)
+        stored = self.load(vectorizer=vectorizer, topic_model=topic_model)
+        hashes = row_hashes(df)
+        known = stored.set_index('object_id')['raw_hash'] if len(stored) else pd.Series()
+        stale = (known.reindex(df['object_id']).values != hashes.values)
+
+        if stale.any():
+            fresh = feature_engineering(df[stale].copy(), vectorizer, topic_model)
+            fresh.insert(0, 'object_id', df['object_id'][stale].values)
+            fresh.insert(1, 'raw_hash', hashes[stale].values)
+            if 'fraud' in df.columns:
+                fresh['fraud'] = df['fraud'][stale].values
+            keep = stored[~stored['object_id'].isin(fresh['object_id'])]
+            stored = pd.concat([keep, fresh], ignore_index=True)
+            stored = stored.drop_duplicates('object_id', keep='last')
+            self._write(stored, path)
+
+        out = stored.set_index('object_id')
+        out = out.reindex(df['object_id']).drop(['raw_hash'], axis=1)
+        out.index = df.index
+        return out.drop(['fraud'], axis=1, errors='ignore')
+
+    def _write(self, df, path):
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        tmp = path + '.tmp'
+        if feather is None:
+            df.reset_index(drop=True).to_pickle(tmp)
+        else:
+            feather.write_feather(df.reset_index(drop=True), tmp)
+        os.rename(tmp, path)
@@ -0,0 +1,60 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    '''
+    Bounded least-recently-used mapping with hit/miss counters. With ttl
+    (seconds) set, entries older than ttl are treated as missing. With
+    maxbytes set, least recently used entries are also evicted once the
+    values' sizeof total goes over it.
+    '''
+
+    def __init__(self, maxsize=10000, ttl=None, maxbytes=None, sizeof=sys.getsizeof):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value, size = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires < time.time():
+                self.bytes -= size
+                self.misses += 1
+                return default
+            self._data[key] = (expires, value, size)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        expires = time.time() + self.ttl if self.ttl else None
+        size = self.sizeof(value) if self.maxbytes else 0
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._data[key] = (expires, value, size)
+            self.bytes += size
+            while len(self._data) > self.maxsize or (self.maxbytes and self.bytes > self.maxbytes
+                                                     and len(self._data) > 1):
+                self.bytes -= self._data.popitem(last=False)[1][2]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
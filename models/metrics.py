@@ -0,0 +1,231 @@
+'''
+In-process latency histograms and counters for the scoring path.
+
+    with metrics.timer('predict'):
+        ...
+    metrics.incr('upstream_errors')
+
+Each stage's timings go into a fixed set of exponential buckets (50us to
+about 26s). An observation is one bisect and two additions under a lock,
+cheap enough to leave on in production. p50/p95/p99 are estimated from
+the buckets by linear interpolation, so they are exact to within one
+bucket, a factor of 2.
+
+prometheus() renders everything in the Prometheus text format for the
+app's /metrics route. Metrics are per process, and behind serve.py a
+scrape lands on whichever worker accepts it, so serve.py has each worker
+share() its numbers through a directory: every worker writes its state
+there once a second and on each scrape, and /metrics reports the sum
+over all of them.
+'''
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+BUCKETS = tuple(0.00005 * 2 ** i for i in range(20))
+QUANTILES = (.5, .95, .99)
+PREFIX = 'fraudly'
+
+
+class Histogram(object):
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class Metrics(object):
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+        self.directory = None
+        self.gauges = None
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def timer(self, name):
+        #Time the block as stage `name`; a block that raises also counts <name>_errors
+        start = time.time()
+        try:
+            yield
+        except Exception:
+            self.incr(name + '_errors')
+            raise
+        finally:
+            self.observe(name, time.time() - start)
+
+    def timed(self, name):
+        #Decorator form of timer
+        def decorate(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return f(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        #{stage: {count, sum, p50, p95, p99}} and {counter: value}
+        with self._lock:
+            stages = dict((name, dict([('count', h.count), ('sum', h.sum)] +
+                                      [('p%d' % (q * 100), h.quantile(q)) for q in QUANTILES]))
+                          for name, h in self.histograms.items())
+            return stages, dict(self.counters)
+
+    def state(self):
+        #Everything needed to rebuild the histograms and counters, as JSON-able lists and dicts
+        with self._lock:
+            return {'histograms': dict((name, [h.counts, h.sum, h.count])
+                                       for name, h in self.histograms.items()),
+                    'counters': dict(self.counters)}
+
+    def merge(self, state):
+        #Add another process's state() into this one
+        with self._lock:
+            for name, (counts, total, count) in state['histograms'].items():
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = Histogram(self.buckets)
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += count
+            for name, value in state['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def share(self, directory, gauges=None, interval=1.):
+        '''
+        Multi-process mode, one call per process after the fork. This
+        process's state, with the values of the `gauges` callable, is
+        written to <directory>/<pid>.json every `interval` seconds and on
+        every scrape, and prometheus() then reports the sum over every file
+        in the directory. Files of exited workers are kept, so counters
+        never go backwards; another worker's numbers can be up to
+        `interval` old.
+        '''
+        self.directory = directory
+        self.gauges = gauges
+        self.flush()
+        def run():
+            while True:
+                time.sleep(interval)
+                self.flush()
+        thread = threading.Thread(target=run, name='metrics-share')
+        thread.daemon = True
+        thread.start()
+
+    def flush(self, gauges=None):
+        #Write this process's state to the shared directory (temp file + rename)
+        if self.directory is None:
+            return
+        state = self.state()
+        if gauges is None and self.gauges is not None:
+            gauges = self.gauges()
+        state['gauges'] = gauges or {}
+        path = os.path.join(self.directory, '%d.json' % os.getpid())
+        with open(path + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.rename(path + '.tmp', path)
+
+    def prometheus(self, gauges=None):
+        '''
+        Prometheus text exposition. `gauges` ({name: value}) adds values
+        read at scrape time, such as cache sizes and hit counts. After
+        share(), the histograms, counters and gauges are summed over all
+        processes.
+        '''
+        if self.directory is not None:
+            self.flush(gauges)
+            combined, gauges = read_shared(self.directory, self.buckets)
+            return combined._render(gauges)
+        return self._render(gauges)
+
+    def _render(self, gauges):
+        lines = []
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            seconds = PREFIX + '_stage_seconds'
+            lines.append('# HELP %s Latency of each scoring stage.' % seconds)
+            lines.append('# TYPE %s histogram' % seconds)
+            for name, h in histograms:
+                cumulative = 0
+                for bound, n in zip(self.buckets, h.counts):
+                    cumulative += n
+                    lines.append('%s_bucket{stage="%s",le="%g"} %d' % (seconds, name, bound, cumulative))
+                lines.append('%s_bucket{stage="%s",le="+Inf"} %d' % (seconds, name, h.count))
+                lines.append('%s_sum{stage="%s"} %.9f' % (seconds, name, h.sum))
+                lines.append('%s_count{stage="%s"} %d' % (seconds, name, h.count))
+
+            quantiles = PREFIX + '_stage_seconds_quantile'
+            lines.append('# HELP %s Bucket-estimated latency quantiles of each stage.' % quantiles)
+            lines.append('# TYPE %s gauge' % quantiles)
+            for name, h in histograms:
+                for q in QUANTILES:
+                    lines.append('%s{stage="%s",quantile="%g"} %.9f' % (quantiles, name, q, h.quantile(q)))
+
+            for name, value in sorted(self.counters.items()):
+                lines.append('# TYPE %s_%s_total counter' % (PREFIX, name))
+                lines.append('%s_%s_total %d' % (PREFIX, name, value))
+
+        for name, value in sorted((gauges or {}).items()):
+            lines.append('# TYPE %s_%s gauge' % (PREFIX, name))
+            lines.append('%s_%s %s' % (PREFIX, name, repr(float(value))))
+        return '\n'.join(lines) + '\n'
+
+
+def read_shared(directory, buckets=BUCKETS):
+    #(Metrics, gauges) summed over every process's file in a share() directory
+    combined, gauges = Metrics(buckets), {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                state = json.load(f)
+        except (IOError, OSError, ValueError):
+            continue  # gone or rewritten under us; it is picked up on the next scrape
+        combined.merge(state)
+        for key, value in state.get('gauges', {}).items():
+            gauges[key] = gauges.get(key, 0) + value
+    return combined, gauges
+
+
+# process-wide instance used by the app and the scoring modules
+metrics = Metrics()
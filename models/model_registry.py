@@ -0,0 +1,132 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+import cPickle as pickle
+from profit import load_operating_point
+from compiled_trees import CompiledEnsemble
+from metrics import metrics
+
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(MODELS_DIR)
+
+log = logging.getLogger(__name__)
+
+
+def load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def has_methods(*names):
+    #Build a check that the loaded artifact exposes the given methods
+    def check(obj):
+        missing = [name for name in names if not hasattr(obj, name)]
+        if missing:
+            raise TypeError('%s is missing %s' % (obj.__class__.__name__, ', '.join(missing)))
+    return check
+
+def file_version(path):
+    #Short content hash, so the same bytes always give the same version
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class ModelRegistry(object):
+    '''
+    Process-wide cache of unpickled artifacts.
+
+    Each artifact is loaded once, checked, and kept in memory. On every get
+    the file's mtime is compared with the one we loaded (at most once every
+    check_interval seconds) and the artifact is reloaded if it changed, so a
+    new pickle can be dropped in place without restarting the app.
+
+    If a reload fails (say the file was caught half written) the last good
+    artifact keeps serving. The failure is logged and counted as
+    model_reload_errors, and the reload is retried at the next check.
+    '''
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self._specs = {}
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, path, loader=load_pickle, check=None):
+        with self._lock:
+            self._specs[name] = (path, loader, check)
+            self._entries.pop(name, None)
+
+    def names(self):
+        return sorted(self._specs)
+
+    def path(self, name):
+        return self._specs[name][0]
+
+    def get(self, name):
+        return self._entry(name)['obj']
+
+    def version(self, name):
+        return self._entry(name)['version']
+
+    def reload(self, name=None):
+        names = [name] if name else self.names()
+        with self._lock:
+            for n in names:
+                self._entries[n] = self._load(n)
+
+    def warm(self, names=None):
+        #Load everything up front (e.g. before forking workers)
+        for name in names or self.names():
+            self.get(name)
+
+    def _entry(self, name):
+        entry = self._entries.get(name)
+        now = time.time()
+        if entry is not None and now - entry['checked'] < self.check_interval:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = self._load(name)
+            else:
+                try:
+                    if os.path.getmtime(self.path(name)) != entry['mtime']:
+                        entry = self._entries[name] = self._load(name)
+                except Exception:
+                    metrics.incr('model_reload_errors')
+                    log.exception('reloading %s from %s failed; keeping version %s',
+                                  name, self.path(name), entry['version'])
+            entry['checked'] = now
+            return entry
+
+    def _load(self, name):
+        path, loader, check = self._specs[name]
+        mtime = os.path.getmtime(path)
+        obj = loader(path)
+        if check is not None:
+            check(obj)
+        return {'obj': obj, 'mtime': mtime, 'version': file_version(path),
+                'checked': time.time()}
+
+
+registry = ModelRegistry()
+registry.register('gdbr', os.path.join(ROOT_DIR, 'gdbr.pickle'),
+                  check=has_methods('predict', 'predict_proba'))
+registry.register('rf', os.path.join(ROOT_DIR, 'rf.pickle'),
+                  check=has_methods('predict', 'predict_proba'))
+# flat-array versions of the above, written by compiled_trees.export
+registry.register('gdbr_compiled', os.path.join(ROOT_DIR, 'gdbr.npz'),
+                  loader=CompiledEnsemble.load)
+registry.register('rf_compiled', os.path.join(ROOT_DIR, 'rf.npz'),
+                  loader=CompiledEnsemble.load)
+registry.register('vectorizer', os.path.join(MODELS_DIR, 'vectorizer3.pkl'),
+                  check=has_methods('transform'))
+registry.register('topic_model', os.path.join(MODELS_DIR, 'model3.pkl'),
+                  check=has_methods('predict'))
+registry.register('operating_point', os.path.join(ROOT_DIR, 'operating_point.json'),
+                  loader=load_operating_point)
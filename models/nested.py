@@ -0,0 +1,91 @@
+'''
+Columnar flattening of the nested ticket_types and previous_payouts fields.
+
+Each of those fields holds a list of dicts per event. flatten walks the
+lists once and lays the items out as flat float arrays plus an offsets
+array: the items of event i are values[offsets[i]:offsets[i + 1]]. The
+per-event aggregates are then grouped NumPy reductions over those arrays
+(np.bincount for sums, np.maximum.reduceat for maxima), instead of a
+Python loop over each event's list per feature.
+'''
+from __future__ import division
+from itertools import chain
+import numpy as np
+import pandas as pd
+
+TICKET_FIELDS = ('cost', 'quantity_total', 'quantity_sold')
+PAYOUT_FIELDS = ('amount',)
+
+
+def _number(value):
+    #Missing or null fields count as 0, like an absent ticket would
+    try:
+        return float(value) if value is not None else 0.
+    except (TypeError, ValueError):
+        return 0.
+
+def flatten(series, fields):
+    '''
+    INPUT:
+    series - column whose values are lists of dicts (None/NaN = no items)
+    fields - dict keys to extract
+    OUTPUT:
+    offsets - int array of length len(series) + 1
+    columns - {field: float array with one entry per item}
+    '''
+    lists = [value if isinstance(value, list) else [] for value in series]
+    lengths = np.fromiter((len(items) for items in lists), dtype=np.int64, count=len(lists))
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    items = list(chain.from_iterable(lists))
+    columns = dict((field, np.fromiter((_number(item.get(field)) for item in items),
+                                       dtype=np.float64, count=len(items)))
+                   for field in fields)
+    return offsets, columns
+
+def group_ids(offsets):
+    #Event index of every flattened item
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+def group_sum(offsets, values, ids=None):
+    ids = group_ids(offsets) if ids is None else ids
+    return np.bincount(ids, weights=values, minlength=len(offsets) - 1)
+
+def group_max(offsets, values, empty=0.):
+    '''
+    Per-event maximum. reduceat misbehaves on empty groups, so it runs over
+    the starts of non-empty events only; an empty event between two others
+    contributes no items, so each non-empty group still ends where the
+    next one starts.
+    '''
+    lengths = np.diff(offsets)
+    result = np.full(len(lengths), empty)
+    nonempty = lengths > 0
+    if nonempty.any():
+        result[nonempty] = np.maximum.reduceat(values, offsets[:-1][nonempty])
+    return result
+
+def ticket_features(series):
+    #Ticket aggregates per event from a ticket_types column
+    offsets, tickets = flatten(series, TICKET_FIELDS)
+    ids = group_ids(offsets)
+    cost = tickets['cost']
+    total = group_sum(offsets, tickets['quantity_total'], ids)
+    sold = group_sum(offsets, tickets['quantity_sold'], ids)
+    sell_through = np.zeros(len(total))
+    np.divide(sold, total, out=sell_through, where=total > 0)
+    return pd.DataFrame({'num_ticket_types': np.diff(offsets),
+                         'num_tix_total': total.astype(np.int64),
+                         'num_tix_sold_by_event': sold.astype(np.int64),
+                         'revenue': group_sum(offsets, cost * tickets['quantity_sold'], ids),
+                         'expected_revenue': group_sum(offsets, cost * tickets['quantity_total'], ids),
+                         'max_ticket_cost': group_max(offsets, cost),
+                         'sell_through': sell_through},
+                        index=series.index)
+
+def payout_features(series):
+    #Payout count and total amount per event from a previous_payouts column
+    offsets, payouts = flatten(series, PAYOUT_FIELDS)
+    return pd.DataFrame({'num_payouts': np.diff(offsets),
+                         'payout_total': group_sum(offsets, payouts['amount'])},
+                        index=series.index)
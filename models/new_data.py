@@ -1,6 +1,5 @@
 import numpy as np
 import pandas as pd
-from bs4 import BeautifulSoup
 import cPickle as pickle
 
 from sklearn.cross_validation import train_test_split
@@ -14,21 +13,18 @@ from sklearn.cross_validation import train_test_split
 import requests
 import json
 import pandas as pd
+from model_registry import registry
+from text_cleaning import clean_column
 
 # from topic_dummies import get_data
 
 def predict(one_line):
     #Expects one line df of new data
 
-    def get_text(cell):
-        return BeautifulSoup(cell, 'html.parser').get_text()
+    clean_text = clean_column(one_line['description'])
 
-    clean_text = one_line['description'].apply(get_text)
-
-    with open('vectorizer3.pkl') as f:
-        vectorizer = pickle.load(f)
-    with open('model3.pkl') as f:
-        model = pickle.load(f)
+    vectorizer = registry.get('vectorizer')
+    model = registry.get('topic_model')
 
     def make_prediction(text):
         if not text.empty:
@@ -0,0 +1,95 @@
+from __future__ import division
+import os
+import json
+import numpy as np
+
+
+def confusion_counts(scores, labels, thresholds, strict=False):
+    '''
+    tp, fp, fn, tn at every threshold, flagging score >= threshold
+    (score > threshold when strict=True).
+
+    Scores are sorted once and positives cumulatively summed, so each
+    threshold costs one binary search instead of a pass over the data.
+    '''
+    scores = np.asarray(scores, dtype=float)
+    labels = np.asarray(labels).astype(bool)
+    order = np.argsort(scores, kind='mergesort')
+    sorted_scores = scores[order]
+    # positives among the i lowest scores
+    positives_below = np.concatenate([[0], np.cumsum(labels[order])])
+
+    side = 'right' if strict else 'left'
+    n_not_flagged = np.searchsorted(sorted_scores, np.asarray(thresholds, dtype=float), side=side)
+
+    fn = positives_below[n_not_flagged]
+    tn = n_not_flagged - fn
+    tp = positives_below[-1] - fn
+    fp = (len(scores) - n_not_flagged) - tp
+    return tp, fp, fn, tn
+
+def profit_curve(cost_benefit, scores, labels, thresholds=None, strict=False):
+    '''
+    INPUT:
+    cost_benefit - 2x2 matrix laid out like standard_confusion_matrix,
+        [[tp, fp], [fn, tn]]
+    scores - predicted probabilities of the positive class
+    labels - true 0/1 labels
+    thresholds - defaults to every sorted score plus 1.0
+    OUTPUT:
+    thresholds, profit per instance, percent of instances flagged
+    '''
+    if thresholds is None:
+        thresholds = np.append(np.sort(scores), 1.0)
+    thresholds = np.asarray(thresholds, dtype=float)
+    cb = np.asarray(cost_benefit, dtype=float)
+
+    tp, fp, fn, tn = confusion_counts(scores, labels, thresholds, strict)
+    n = len(scores)
+    profits = (cb[0, 0] * tp + cb[0, 1] * fp + cb[1, 0] * fn + cb[1, 1] * tn) / n
+    percent_flagged = 100. * (tp + fp) / n
+    return thresholds, profits, percent_flagged
+
+def profit_curves(cost_benefit, scores_by_model, labels, **kwargs):
+    #profit_curve for several models at once: {name: scores} -> {name: curve}
+    return dict((name, profit_curve(cost_benefit, scores, labels, **kwargs))
+                for name, scores in scores_by_model.items())
+
+def best_threshold(cost_benefit, scores, labels):
+    #(threshold, profit per instance) at the most profitable threshold
+    thresholds, profits, _ = profit_curve(cost_benefit, scores, labels)
+    best = np.argmax(profits)
+    return thresholds[best], profits[best]
+
+def operating_point(cost_benefit, scores, labels, review_rate=0.1):
+    '''
+    Serving thresholds for the app: events at or above `threshold` (the
+    profit-optimal cutoff) are high risk, those at or above
+    `review_threshold` are medium risk. review_threshold is set so roughly
+    `review_rate` of events land in medium or high, to match what analysts
+    can review, but never above threshold.
+    '''
+    threshold, expected_profit = best_threshold(cost_benefit, scores, labels)
+    review_threshold = min(threshold, np.percentile(scores, 100. * (1 - review_rate)))
+    return {'threshold': float(threshold),
+            'review_threshold': float(review_threshold),
+            'cost_benefit': np.asarray(cost_benefit).tolist(),
+            'expected_profit': float(expected_profit)}
+
+def operating_point_path(model_path):
+    #winner.pickle -> winner.operating_point.json, so a model and its thresholds are deployed together
+    return os.path.splitext(model_path)[0] + '.operating_point.json'
+
+def save_operating_point(path, point):
+    #Write to a temp file and rename, so a running app never reads half a file
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(point, f, indent=2, sort_keys=True)
+    os.rename(tmp, path)
+
+def load_operating_point(path):
+    with open(path) as f:
+        point = json.load(f)
+    if not 0 <= point['review_threshold'] <= point['threshold'] <= 1:
+        raise ValueError('bad operating point in %s: %r' % (path, point))
+    return point
@@ -0,0 +1,159 @@
+import os
+import re
+import time
+import errno
+import atexit
+import shelve
+import threading
+from lru import LRUCache
+from versioning import feature_version, raw_hash
+
+
+def _shelf_files(path):
+    #{pid: [files]} for the shelves ShelveBackend(path) has opened; dbm may add extensions
+    directory, base = os.path.split(os.path.abspath(path))
+    pattern = re.compile(re.escape(base) + r'\.(\d+)(\..*)?$')
+    files = {}
+    for name in os.listdir(directory or '.'):
+        match = pattern.match(name)
+        if match:
+            files.setdefault(int(match.group(1)), []).append(os.path.join(directory, name))
+    return files
+
+def _remove(files):
+    for name in files:
+        try:
+            os.remove(name)
+        except OSError:
+            pass  # another process cleaned it up first
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class ShelveBackend(object):
+    '''
+    Per-process scratch store on disk (stdlib shelve), for more scores than
+    the in-process LRU should hold; entries carry their own expiry.
+    shelve/dbm has no locking across processes, so each process opens its
+    own file, <path>.<pid>, on first use (after any fork). Nothing survives
+    a restart: the file is deleted on close() or at exit, and files left by
+    processes that are gone (say a killed serve.py worker) are deleted when
+    the next one opens. Use RedisBackend to share scores between workers
+    or keep them across restarts. Writes are synced every sync_every sets.
+    '''
+
+    def __init__(self, path, sync_every=100):
+        self.path = path
+        self.sync_every = sync_every
+        self._pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if self._pid != os.getpid():
+            for pid, files in _shelf_files(self.path).items():
+                if pid == os.getpid() or not _alive(pid):
+                    _remove(files)
+            self._db = shelve.open('%s.%d' % (self.path, os.getpid()))
+            self._pid = os.getpid()
+            self._pending = 0
+            atexit.register(self.close)
+        return self._db
+
+    def close(self):
+        #Close and delete this process's shelf; a forked child leaves its parent's alone
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._db.close()
+            self._pid = None
+            _remove(_shelf_files(self.path).get(os.getpid(), []))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._open().get(key)
+        if entry is None or (entry[0] is not None and entry[0] < time.time()):
+            return None
+        return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            db = self._open()
+            db[key] = (time.time() + ttl if ttl else None, value)
+            self._pending += 1
+            if self._pending >= self.sync_every:
+                db.sync()
+                self._pending = 0
+
+
+class RedisBackend(object):
+    #Shared store on any client with redis-py's get/set(ex=...) interface
+
+    def __init__(self, client, prefix='fraudly:score:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return float(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, repr(value), ex=int(ttl) if ttl else None)
+
+
+class ScoreCache(object):
+    '''
+    Fraud probabilities keyed by (object_id, model_version, feature_version)
+    and a hash of the fields the event's features are computed from, so a
+    corrected event POSTed under an existing object_id is rescored rather
+    than served the old score.
+
+    Lookups hit an in-process LRU with a TTL first, then the optional shared
+    backend (ShelveBackend, RedisBackend or anything with get/set).
+    Deploying a new pickle changes the registry's model_version and bumping
+    data_pipeline.FEATURE_VERSION changes feature_version, so stale scores
+    are never served; they just age out.
+
+    Only probabilities are cached. Tiers and labels are recomputed from the
+    current operating point, so retuning thresholds takes effect at once.
+    '''
+
+    def __init__(self, maxsize=100000, ttl=3600, backend=None):
+        self.ttl = ttl
+        self.backend = backend
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.backend_hits = 0
+        self.feature_version = feature_version()
+
+    def key(self, event, model_version):
+        return str('%s|%s|%s|%s' % (event['object_id'], model_version, self.feature_version,
+                                    raw_hash(event)))
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self.backend_hits += 1
+                self.local.put(key, value)
+        return value
+
+    def set(self, key, value):
+        self.local.put(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value, self.ttl)
+
+    def stats(self):
+        lookups = self.local.hits + self.local.misses
+        hits = self.local.hits + self.backend_hits
+        return {'hits': hits,
+                'misses': lookups - hits,
+                'local_hits': self.local.hits,
+                'backend_hits': self.backend_hits,
+                'size': len(self.local),
+                'hit_rate': float(hits) / lookups if lookups else 0.}
@@ -0,0 +1,69 @@
+import os
+import numpy as np
+import pandas as pd
+from data_pipeline import feature_engineering
+from model_registry import registry
+from metrics import metrics
+
+TIERS = np.array(['low', 'medium', 'high'])
+
+# registry name of the serving model; set FRAUDLY_MODEL=gdbr_compiled to
+# serve the flat-array export of gdbr.pickle
+MODEL_NAME = os.environ.get('FRAUDLY_MODEL', 'gdbr')
+
+
+def fraud_probabilities(df, model_name=MODEL_NAME):
+    #Feature engineering + predict_proba over a whole frame of raw events
+    model = registry.get(model_name)
+    with metrics.timer('feature_engineering'):
+        X = feature_engineering(df)
+    with metrics.timer('predict'):
+        return model.predict_proba(X)[:, 1]
+
+def risk_tiers(probabilities, point):
+    #low / medium / high from the stored operating point
+    level = ((probabilities >= point['review_threshold']).astype(int) +
+             (probabilities >= point['threshold']).astype(int))
+    return TIERS[level]
+
+def cached_probabilities(events, model_name, cache):
+    #Probabilities from the score cache; only the misses are scored (in one batch)
+    version = registry.version(model_name)
+    keys = [cache.key(e, version) if e.get('object_id') is not None else None
+            for e in events]
+    cached = [cache.get(key) if key else None for key in keys]
+    probabilities = np.array([np.nan if p is None else p for p in cached], dtype=float)
+
+    missing = np.flatnonzero(np.isnan(probabilities))
+    if len(missing):
+        with metrics.timer('frame'):
+            df = pd.DataFrame([events[i] for i in missing])
+        fresh = fraud_probabilities(df, model_name)
+        probabilities[missing] = fresh
+        for i, probability in zip(missing, fresh):
+            if keys[i]:
+                cache.set(keys[i], float(probability))
+    return probabilities
+
+def score_events(events, model_name=MODEL_NAME, cache=None):
+    '''
+    Score a list of raw event dicts in one vectorized pass. Each result has
+    the fraud probability, its risk tier, and a 0/1 label at the
+    profit-optimal threshold. With a ScoreCache, events already scored by
+    this model and feature version are not rescored.
+    '''
+    point = registry.get('operating_point')
+    if cache is None:
+        with metrics.timer('frame'):
+            df = pd.DataFrame(events)
+        probabilities = fraud_probabilities(df, model_name)
+    else:
+        probabilities = cached_probabilities(events, model_name, cache)
+    tiers = risk_tiers(probabilities, point)
+    results = []
+    for event, probability, tier in zip(events, probabilities, tiers):
+        results.append({'object_id': event.get('object_id'),
+                        'fraud_probability': float(probability),
+                        'risk_tier': str(tier),
+                        'label': int(probability >= point['threshold'])})
+    return results
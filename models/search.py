@@ -0,0 +1,161 @@
+from __future__ import division
+import os
+import argparse
+import itertools
+import multiprocessing
+import numpy as np
+import pandas as pd
+from sklearn.cross_validation import train_test_split
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+import profit
+from data_pipeline import get_data
+from feature_store import FeatureStore
+from JoannasModels import save_to_pickle
+from training import DEFAULT_COST_BENEFIT
+from model_registry import registry
+
+GBM_GRID = {'learning_rate': [0.01, 0.03, 0.1, 0.3],
+            'max_depth': [2, 3, 5],
+            'subsample': [0.8, 1.0]}
+GBM_MAX_ESTIMATORS = 500
+
+RF_GRID = {'n_estimators': [50, 200],
+           'max_features': ['sqrt', 0.5],
+           'min_samples_leaf': [1, 5],
+           'class_weight': [None, {1: 9}, 'balanced']}
+
+# set once per worker process by _init_worker
+_data = None
+
+
+def expand_grid(kind, grid):
+    #[(kind, params), ...] for every combination in grid
+    keys = sorted(grid)
+    return [(kind, dict(zip(keys, values)))
+            for values in itertools.product(*[grid[k] for k in keys])]
+
+def default_candidates():
+    return expand_grid('gbm', GBM_GRID) + expand_grid('rf', RF_GRID)
+
+def build_estimator(kind, params, random_state=1):
+    if kind == 'gbm':
+        params = dict({'n_estimators': GBM_MAX_ESTIMATORS}, **params)
+        return GradientBoostingClassifier(random_state=random_state, **params)
+    return RandomForestClassifier(n_jobs=1, random_state=random_state, **params)
+
+def _init_worker(data):
+    global _data
+    _data = data
+
+def _evaluate(task):
+    '''
+    Fit one candidate on the first n_samples training rows and return its
+    best profit on the validation set. GBM candidates are fit once with
+    GBM_MAX_ESTIMATORS trees and every tree count is scored from
+    staged_predict_proba, so n_estimators is tuned for free.
+    '''
+    index, kind, params, n_samples, cost_benefit, random_state = task
+    X_train, y_train, X_val, y_val = _data
+    model = build_estimator(kind, params, random_state)
+    model.fit(X_train[:n_samples], y_train[:n_samples])
+
+    if kind == 'gbm':
+        best_profit, best_params = None, None
+        for n_trees, probabilities in enumerate(model.staged_predict_proba(X_val), 1):
+            threshold, stage_profit = profit.best_threshold(cost_benefit, probabilities[:, 1], y_val)
+            if best_profit is None or stage_profit > best_profit:
+                best_profit = stage_profit
+                best_params = dict(params, n_estimators=n_trees)
+                best_threshold = threshold
+    else:
+        probabilities = model.predict_proba(X_val)[:, 1]
+        best_threshold, best_profit = profit.best_threshold(cost_benefit, probabilities, y_val)
+        best_params = params
+
+    return {'candidate': index, 'kind': kind, 'params': best_params, 'n_samples': n_samples,
+            'profit': best_profit, 'threshold': best_threshold}
+
+def successive_halving(X, y, candidates=None, cost_benefit=DEFAULT_COST_BENEFIT, eta=3,
+                       min_samples=500, val_size=.3, n_jobs=None, random_state=1):
+    '''
+    Successive halving over candidates ((kind, params) pairs, see
+    default_candidates). Round r fits every surviving candidate on
+    min_samples * eta**r training rows, ranks them by expected profit per
+    instance on a fixed validation split, and keeps the top 1/eta. Rounds
+    stop once one candidate is left or the full training set has been used.
+
+    Returns (best kind, best params, DataFrame of every round's results).
+    '''
+    candidates = candidates or default_candidates()
+    X_train, X_val, y_train, y_val = train_test_split(np.asarray(X), np.asarray(y), test_size=val_size,
+                                                      random_state=random_state)
+    data = (X_train, y_train, X_val, y_val)
+
+    n_jobs = n_jobs or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(n_jobs, _init_worker, (data,))
+    rounds = []
+    survivors = list(enumerate(candidates))
+    n_samples = min(min_samples, len(y_train))
+    try:
+        for r in itertools.count():
+            tasks = [(i, kind, params, n_samples, cost_benefit, random_state)
+                     for i, (kind, params) in survivors]
+            results = pd.DataFrame(pool.map(_evaluate, tasks))
+            results['round'] = r
+            rounds.append(results)
+
+            results = results.sort_values('profit', ascending=False, kind='mergesort')
+            if len(survivors) == 1 or n_samples >= len(y_train):
+                break
+            keep = set(results['candidate'].iloc[:max(1, len(survivors) // eta)])
+            survivors = [(i, c) for i, c in survivors if i in keep]
+            n_samples = min(n_samples * eta, len(y_train))
+    finally:
+        pool.close()
+        pool.join()
+
+    best = results.iloc[0]
+    return best['kind'], best['params'], pd.concat(rounds, ignore_index=True)
+
+def search_and_save(X, y, filename, X_holdout=None, y_holdout=None,
+                    cost_benefit=DEFAULT_COST_BENEFIT, **kwargs):
+    '''
+    Run the search, refit the winner on all of X and pickle it like
+    JoannasModels does. With a holdout set, the winner's operating point
+    (tuned on the holdout) is written next to it, see profit.operating_point_path.
+    '''
+    kind, params, results = successive_halving(X, y, cost_benefit=cost_benefit, **kwargs)
+    model = build_estimator(kind, params).fit(np.asarray(X), np.asarray(y))
+    save_to_pickle(filename, model)
+    if X_holdout is not None:
+        scores = model.predict_proba(np.asarray(X_holdout))[:, 1]
+        point = profit.operating_point(cost_benefit, scores, np.asarray(y_holdout))
+        profit.save_operating_point(profit.operating_point_path(filename), point)
+    return model, results
+
+if __name__ == '__main__':
+    # python models/search.py --out candidates/winner.pickle   (from the repo root)
+    # To deploy, copy the winner over gdbr.pickle and its
+    # .operating_point.json over operating_point.json together.
+    parser = argparse.ArgumentParser(description='Successive-halving search over GBM and RF')
+    parser.add_argument('--out', required=True,
+                        help='where to pickle the winner; must not be a live serving artifact')
+    parser.add_argument('--results', default='search_results.csv')
+    args = parser.parse_args()
+
+    out = os.path.abspath(args.out)
+    live = set(os.path.abspath(registry.path(name)) for name in registry.names())
+    if out in live or profit.operating_point_path(out) in live:
+        parser.error('%s is a live serving artifact; write the winner elsewhere' % args.out)
+    if os.path.dirname(out) and not os.path.isdir(os.path.dirname(out)):
+        os.makedirs(os.path.dirname(out))
+
+    X_train, X_test, y_train, y_test = get_data()
+    store = FeatureStore()
+    x_feature_train = store.features(X_train.assign(fraud=y_train))
+    x_feature_test = store.features(X_test.assign(fraud=y_test))
+
+    model, results = search_and_save(x_feature_train, y_train, out, x_feature_test, y_test)
+    results.to_csv(args.results, index=False)
+    print results.sort_values('profit', ascending=False).head(10)
+    print 'wrote %s and %s' % (out, profit.operating_point_path(out))
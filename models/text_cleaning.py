@@ -0,0 +1,135 @@
+import hashlib
+from HTMLParser import HTMLParser, HTMLParseError
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+from lru import LRUCache
+from metrics import metrics
+
+
+# whitespace-only text between tags collapses to one space or newline,
+# except inside these, as BeautifulSoup does
+PRESERVE_WHITESPACE_TAGS = frozenset(['pre', 'textarea'])
+ASCII_SPACES = u'\x20\x0a\x09\x0c\x0d'
+
+# what strip_html falls back to on markup HTMLParser rejects: the most
+# lenient parser BeautifulSoup has installed
+FALLBACK_PARSER = next(name for name in ('lxml', 'html5lib', 'html.parser')
+                       if builder_registry.lookup(name) is not None)
+
+
+class _TextExtractor(HTMLParser):
+    '''
+    Collects text nodes, unescaped entities and CDATA; tags, comments and
+    declarations are dropped. Runs of text between two pieces of markup
+    are joined and whitespace-only ones collapsed the way BeautifulSoup's
+    tree builder does, so get_text() output matches.
+    '''
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.parts = []
+        self.run = []
+        self.preserve = 0
+
+    def _end_run(self):
+        if self.run:
+            text = u''.join(self.run)
+            self.run = []
+            if not self.preserve and not text.strip(ASCII_SPACES):
+                text = u'\n' if u'\n' in text else u' '
+            self.parts.append(text)
+
+    def handle_data(self, data):
+        self.run.append(data)
+
+    def handle_entityref(self, name):
+        self.run.append(self.unescape('&%s;' % name))
+
+    def handle_charref(self, name):
+        self.run.append(self.unescape('&#%s;' % name))
+
+    def handle_starttag(self, tag, attrs):
+        self._end_run()
+        if tag in PRESERVE_WHITESPACE_TAGS:
+            self.preserve += 1
+
+    def handle_endtag(self, tag):
+        self._end_run()
+        if tag in PRESERVE_WHITESPACE_TAGS and self.preserve:
+            self.preserve -= 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._end_run()
+
+    def handle_comment(self, data):
+        self._end_run()
+
+    def handle_decl(self, decl):
+        self._end_run()
+
+    def handle_pi(self, data):
+        self._end_run()
+
+    def unknown_decl(self, data):
+        self._end_run()
+        if data.upper().startswith('CDATA['):
+            self.parts.append(data[len('CDATA['):])
+
+    def close(self):
+        HTMLParser.close(self)
+        self._end_run()
+
+
+def strip_html(cell):
+    '''
+    Same text as BeautifulSoup(cell, 'html.parser').get_text(), without
+    building a parse tree. Plain text (no tags or entities) is returned as is.
+    Markup HTMLParser rejects goes to BeautifulSoup with FALLBACK_PARSER
+    rather than returning the text parsed before the error.
+    '''
+    if not isinstance(cell, basestring):
+        return u''
+    if '<' not in cell and '&' not in cell:
+        return cell
+    parser = _TextExtractor()
+    try:
+        parser.feed(cell)
+        parser.close()
+    except HTMLParseError:
+        metrics.incr('html_parse_fallbacks')
+        return BeautifulSoup(cell, FALLBACK_PARSER).get_text()
+    return u''.join(parser.parts)
+
+
+# bounded by the size of the stripped text too, so a run of very long
+# descriptions cannot grow the cache without limit
+_cache = LRUCache(maxsize=20000, maxbytes=64 << 20)
+
+def _content_key(cell):
+    if isinstance(cell, unicode):
+        cell = cell.encode('utf-8')
+    return hashlib.sha1(cell).digest()
+
+def clean_html(cell):
+    '''
+    Strip HTML from a description / org_desc cell.
+
+    Results are cached by content hash, since the same organizer's org_desc
+    repeats across many events.
+    '''
+    if not isinstance(cell, basestring):
+        return u''
+    key = _content_key(cell)
+    text = _cache.get(key)
+    if text is None:
+        text = strip_html(cell)
+        _cache.put(key, text)
+    return text
+
+def clean_column(series):
+    #Clean a whole column, stripping each distinct value only once
+    with metrics.timer('html_clean'):
+        return series.map(clean_html)
+
+def cache_stats():
+    return {'hits': _cache.hits, 'misses': _cache.misses, 'size': len(_cache), 'bytes': _cache.bytes}
@@ -0,0 +1,53 @@
+from __future__ import division
+import pandas as pd
+from text_cleaning import clean_column
+
+# mean caps_proportion on the training set, used for empty descriptions
+CAPS_PROPORTION_DEFAULT = .045
+
+CAPS = r'[A-Z]'
+DIGITS = r'[0-9]'
+URLS = r'https?://|www\.'
+TAGS = r'<[^>]+>'
+
+
+def _text(series):
+    return series.fillna('')
+
+def exclamation_points(series):
+    return _text(series).str.count('!')
+
+def caps_proportion(series):
+    #Share of characters that are A-Z; empty descriptions get the training mean
+    text = _text(series)
+    length = text.str.len()
+    proportion = text.str.count(CAPS) / length.where(length > 0)
+    return proportion.fillna(CAPS_PROPORTION_DEFAULT)
+
+def digit_ratio(series):
+    text = _text(series)
+    length = text.str.len()
+    return (text.str.count(DIGITS) / length.where(length > 0)).fillna(0.)
+
+def url_count(series):
+    return _text(series).str.count(URLS)
+
+def html_tag_density(series):
+    #HTML tags per 1000 characters of raw description
+    text = _text(series)
+    length = text.str.len()
+    return (1000. * text.str.count(TAGS) / length.where(length > 0)).fillna(0.)
+
+def clean_body_length(series):
+    #body_length recomputed from the description with its HTML stripped
+    return clean_column(series).str.len()
+
+def text_statistics(series):
+    #Every statistic above for a whole column, one DataFrame column each
+    return pd.DataFrame({'exclamation_points': exclamation_points(series),
+                         'caps_proportion': caps_proportion(series),
+                         'digit_ratio': digit_ratio(series),
+                         'url_count': url_count(series),
+                         'html_tag_density': html_tag_density(series),
+                         'clean_body_length': clean_body_length(series)},
+                        index=series.index)
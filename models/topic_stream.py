@@ -0,0 +1,140 @@
+'''
+Incremental topic model for event descriptions.
+
+build_pickles.build_pickle and topic-models.topic_dummies refit TF-IDF and
+NMF from scratch, so topic numbers change meaning between fits. Here the
+vocabulary is fixed (the fitted vectorizer3.pkl) and OnlineNMF is updated
+in place with partial_fit on newly ingested descriptions. Each update
+starts from the previous components, so topic k stays topic k across
+versions.
+
+Versions are saved as data/topics/topics-v<n>.pkl. The latest one plugs
+straight into feature_engineering(df, vectorizer, topic_model).
+
+    python topic_stream.py    # fold in descriptions ingested since the last version
+'''
+import os
+import re
+import glob
+import cPickle as pickle
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+from model_registry import registry, ROOT_DIR
+from text_cleaning import clean_column
+
+N_TOPICS = 9
+DEFAULT_ROOT = os.path.join(ROOT_DIR, 'data', 'topics')
+EPS = 1e-10
+
+
+class OnlineNMF(object):
+    '''
+    Mini-batch NMF (X ~ W H) updated one batch at a time.
+
+    partial_fit finds W for the batch with H fixed, folds the batch into
+    running statistics A = sum(W'W) and B = sum(W'X) (older batches are
+    down-weighted by `forget`), and then takes multiplicative steps on H
+    against those statistics. All updates are multiplicative, so W and H
+    stay non-negative.
+    '''
+
+    def __init__(self, n_components=N_TOPICS, forget=0.95, max_iter=100, random_state=1):
+        self.n_components = n_components
+        self.forget = forget
+        self.max_iter = max_iter
+        self.random_state = random_state
+        self.components_ = None
+        self.n_docs = 0
+
+    def _init(self, X):
+        rng = np.random.RandomState(self.random_state)
+        scale = np.sqrt(X.mean() / self.n_components)
+        self.components_ = scale * rng.rand(self.n_components, X.shape[1])
+        self._A = np.zeros((self.n_components, self.n_components))
+        self._B = np.zeros((self.n_components, X.shape[1]))
+
+    def transform(self, X):
+        H = self.components_
+        XHt = np.asarray(X.dot(H.T))
+        HHt = H.dot(H.T)
+        W = np.full((X.shape[0], self.n_components), XHt.mean() / max(HHt.mean(), EPS) + EPS)
+        for _ in range(self.max_iter):
+            W *= XHt / (W.dot(HHt) + EPS)
+        return W
+
+    def partial_fit(self, X):
+        if self.components_ is None:
+            self._init(X)
+        W = self.transform(X)
+        self._A = self.forget * self._A + W.T.dot(W)
+        self._B = self.forget * self._B + np.asarray((X.T.dot(W)).T)
+        H = self.components_
+        for _ in range(self.max_iter):
+            H *= self._B / (self._A.dot(H) + EPS)
+        self.n_docs += X.shape[0]
+        return self
+
+    def predict(self, X):
+        #Topic label per row ('topic1'..'topicN'), as feature_engineering expects
+        labels = np.array(['topic%d' % (i + 1) for i in range(self.n_components)])
+        return labels[np.argmax(self.transform(X), axis=1)]
+
+
+class TopicModelStore(object):
+    #Versioned topic artifacts: {'version', 'vectorizer', 'model', 'last_id', 'updated_at'}
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+
+    def versions(self):
+        paths = glob.glob(os.path.join(self.root, 'topics-v*.pkl'))
+        return sorted(int(re.search(r'topics-v(\d+)\.pkl$', p).group(1)) for p in paths)
+
+    def path(self, version):
+        return os.path.join(self.root, 'topics-v%d.pkl' % version)
+
+    def load(self, version=None):
+        versions = self.versions()
+        if not versions:
+            return None
+        with open(self.path(version or versions[-1]), 'rb') as f:
+            return pickle.load(f)
+
+    def save(self, artifact):
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        tmp = self.path(artifact['version']) + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(artifact, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp, self.path(artifact['version']))
+
+
+def refresh(descriptions, store=None, last_id=None):
+    '''
+    Fold a batch of raw (HTML) descriptions into the latest topic model and
+    save the result as the next version. The first call starts a model from
+    the fixed vectorizer3.pkl vocabulary.
+    '''
+    store = store or TopicModelStore()
+    artifact = store.load() or {'version': 0, 'vectorizer': registry.get('vectorizer'),
+                                'model': OnlineNMF(), 'last_id': None}
+    X = artifact['vectorizer'].transform(clean_column(descriptions))
+    artifact['model'].partial_fit(X)
+    artifact.update(version=artifact['version'] + 1, updated_at=datetime.utcnow(),
+                    last_id=last_id if last_id is not None else artifact['last_id'])
+    store.save(artifact)
+    return artifact
+
+if __name__ == '__main__':
+    store = TopicModelStore()
+    latest = store.load()
+    query = {'_id': {'$gt': latest['last_id']}} if latest and latest['last_id'] else {}
+    docs = list(MongoClient()['fraudly']['fraud'].find(query, {'description': 1}).sort('_id', 1))
+    if docs:
+        artifact = refresh(pd.Series([d.get('description') for d in docs]), store, docs[-1]['_id'])
+        print 'topic model v%d: %d new descriptions, %d total' % (
+            artifact['version'], len(docs), artifact['model'].n_docs)
+    else:
+        print 'no new descriptions'
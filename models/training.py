@@ -0,0 +1,85 @@
+from __future__ import division
+import multiprocessing
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.cross_validation import StratifiedKFold
+from sklearn.metrics import precision_score, recall_score, f1_score, roc_auc_score
+import profit
+
+DEFAULT_COST_BENEFIT = np.array([[100, 0], [-200, 0]])
+
+# set once per worker process by _init_worker, so the data is not
+# re-pickled for every (model, fold) task
+_X = _y = None
+
+
+def _init_worker(X, y):
+    global _X, _y
+    _X, _y = X, y
+
+def _fit_fold(task):
+    name, estimator, fold, train, test, cost_benefit, resampler = task
+    X_train, y_train = _X[train], _y[train]
+    if resampler is not None:
+        # oversample the training fold only; the test fold stays untouched
+        X_train, y_train = resampler(X_train, y_train)
+    model = clone(estimator).fit(X_train, y_train)
+    probabilities = model.predict_proba(_X[test])[:, 1]
+    predictions = (probabilities >= 0.5).astype(int)
+    threshold, best_profit = profit.best_threshold(cost_benefit, probabilities, _y[test])
+    return {'model': name,
+            'fold': fold,
+            'precision': precision_score(_y[test], predictions),
+            'recall': recall_score(_y[test], predictions),
+            'f1': f1_score(_y[test], predictions),
+            'auc': roc_auc_score(_y[test], probabilities),
+            'profit': best_profit,
+            'best_threshold': threshold}
+
+def evaluate_models(models, X, y, cv=5, cost_benefit=DEFAULT_COST_BENEFIT,
+                    n_jobs=None, random_state=1, results_path=None, resampler=None):
+    '''
+    INPUT:
+    models - {name: unfitted estimator}
+    X, y - training data
+    OUTPUT:
+    DataFrame with one row per (model, fold): precision, recall, F1 and AUC
+    at the 0.5 cutoff, plus the best profit per instance and its threshold.
+
+    Every fold of every model is fit exactly once, and the fits are spread
+    over a pool of n_jobs processes (all cores by default). The table is
+    also written to results_path as CSV when given.
+
+    resampler, if given, is applied to each training fold before fitting,
+    e.g. functools.partial(data_pipeline.smote, target=.3, random_state=1).
+    It must be picklable (a module-level function or a partial of one).
+    '''
+    X = np.asarray(X)
+    y = np.asarray(y)
+    folds = list(StratifiedKFold(y, n_folds=cv, shuffle=True, random_state=random_state))
+    tasks = [(name, estimator, fold, train, test, cost_benefit, resampler)
+             for name, estimator in sorted(models.items())
+             for fold, (train, test) in enumerate(folds)]
+
+    n_jobs = n_jobs or multiprocessing.cpu_count()
+    if n_jobs == 1:
+        _init_worker(X, y)
+        rows = map(_fit_fold, tasks)
+    else:
+        pool = multiprocessing.Pool(min(n_jobs, len(tasks)), _init_worker, (X, y))
+        try:
+            rows = pool.map(_fit_fold, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    results = pd.DataFrame(rows, columns=['model', 'fold', 'precision', 'recall', 'f1',
+                                          'auc', 'profit', 'best_threshold'])
+    if results_path:
+        results.to_csv(results_path, index=False)
+    return results
+
+def summarize(results):
+    #Mean of every metric across folds, one row per model
+    return results.drop('fold', axis=1).groupby('model').mean()
@@ -0,0 +1,38 @@
+'''
+Retune the live operating_point.json for the model the app serves.
+
+    python models/tune_threshold.py                       # FRAUDLY_MODEL, default gdbr
+    python models/tune_threshold.py --model gdbr_compiled --review-rate .05
+
+Scores the get_data holdout split with the served model through the same
+feature engineering as the app, and writes the profit-optimal thresholds
+to the registry's operating_point.json. The point records the content
+version of the model it was tuned on, so a stale point can be spotted
+after the model is swapped.
+'''
+import argparse
+import numpy as np
+import profit
+import scoring
+from data_pipeline import get_data
+from model_registry import registry
+
+COST_BENEFIT = np.array([[100, 0], [-200, 0]])
+
+
+def tune(model_name, X_test, y_test, cost_benefit=COST_BENEFIT, review_rate=0.1):
+    scores = scoring.fraud_probabilities(X_test.copy(), model_name)
+    point = profit.operating_point(cost_benefit, scores, np.asarray(y_test), review_rate)
+    point['model_version'] = registry.version(model_name)
+    return point
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tune the serving thresholds for the live model')
+    parser.add_argument('--model', default=scoring.MODEL_NAME, help='registry name of the served model')
+    parser.add_argument('--review-rate', type=float, default=0.1)
+    args = parser.parse_args()
+
+    X_train, X_test, y_train, y_test = get_data()
+    point = tune(args.model, X_test, y_test, review_rate=args.review_rate)
+    profit.save_operating_point(registry.path('operating_point'), point)
+    print 'wrote %s: %r' % (registry.path('operating_point'), point)
@@ -0,0 +1,147 @@
+import os
+import time
+import Queue
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from multiprocessing.pool import ThreadPool
+from metrics import metrics
+
+DATA_POINT_URL = os.environ.get('FRAUDLY_DATA_POINT_URL',
+                                'http://galvanize-case-study-on-fraud.herokuapp.com/data_point')
+
+
+def make_session(pool_size=8):
+    #One keep-alive session shared by all fetch threads
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def fetch_event(session=None, url=DATA_POINT_URL, timeout=10):
+    #One event from the data_point feed, or None if the fetch failed
+    #(connection error, timeout, non-200 status or a body that is not JSON)
+    start = time.time()
+    try:
+        response = (session or requests).get(url, timeout=timeout)
+        event = response.json() if response.status_code == 200 else None
+    except (requests.RequestException, ValueError):
+        event = None
+    metrics.observe('upstream_fetch', time.time() - start)
+    if event is None:
+        metrics.incr('upstream_fetch_errors')
+    return event
+
+
+class EventPrefetcher(object):
+    '''
+    Background thread that keeps a bounded queue of live events that are
+    already scored, so a request can take one without waiting on upstream.
+
+    Events are fetched `batch_size` at a time over a pooled keep-alive
+    session, scored in one call to `score` (a list of events -> list of
+    results, e.g. scoring.score_events), and queued as (event, result)
+    pairs. When the queue is full the thread blocks, so it never runs more
+    than `maxsize` events ahead. Failed rounds back off up to max_backoff.
+    If a round's batch fails to score, its events are scored one at a time
+    and only the ones that fail are dropped.
+
+    `version` (optional, no arguments -> any value) names what the scores
+    depend on, e.g. the registry versions of the model and operating
+    point. Each result is queued with the version it was scored under, and
+    get() rescores an event whose version is no longer current, so a
+    model hot reload never serves scores from the old model.
+
+    start() is safe to call on every request: it only starts the thread
+    once per process, so it also works after a pre-fork server forks. If
+    the thread has died without stop() being called, start() replaces it.
+    '''
+
+    def __init__(self, score, url=DATA_POINT_URL, maxsize=32, batch_size=8,
+                 timeout=10, max_backoff=30.0, version=None):
+        self.score = score
+        self.version = version or (lambda: None)
+        self.url = url
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.errors = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _running(self):
+        return (self._pid == os.getpid() and
+                (self._thread.is_alive() or self._stopped.is_set()))
+
+    def start(self):
+        if self._running():
+            return
+        with self._lock:
+            if self._running():
+                return
+            if self._pid != os.getpid():
+                self.queue = Queue.Queue(maxsize=self.maxsize)
+                self._stopped = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='event-prefetcher')
+            self._thread.daemon = True
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        if self._pid == os.getpid():
+            self._stopped.set()
+
+    def get(self, timeout=None):
+        #Next (event, result) pair; raises Queue.Empty after timeout seconds
+        self.start()
+        event, result, version = self.queue.get(timeout=timeout)
+        if version != self.version():
+            # scored before a model / threshold reload
+            metrics.incr('prefetch_rescored')
+            result = self.score([event])[0]
+        return event, result
+
+    def _score(self, events):
+        #(event, result) pairs; if the batch fails, score each event on its own
+        try:
+            return zip(events, self.score(events))
+        except Exception:
+            scored = []
+            for event in events:
+                try:
+                    scored.append((event, self.score([event])[0]))
+                except Exception:
+                    metrics.incr('prefetch_score_errors')
+            return scored
+
+    def _run(self):
+        session = make_session(self.batch_size)
+        pool = ThreadPool(self.batch_size)
+        fetch = lambda _: fetch_event(session, self.url, self.timeout)
+        wait = 0
+        while not self._stopped.is_set():
+            # nothing in a round may kill the thread; a failure is a backoff
+            try:
+                events = [event for event in pool.map(fetch, range(self.batch_size))
+                          if isinstance(event, dict)]
+                version = self.version()
+                scored = self._score(events) if events else []
+            except Exception:
+                scored = []
+            if not scored:
+                # upstream down or scoring failing: back off, keep trying
+                self.errors += 1
+                wait = min(max(wait * 2, 0.5), self.max_backoff)
+                self._stopped.wait(wait)
+                continue
+            wait = 0
+            for event, result in scored:
+                while not self._stopped.is_set():
+                    try:
+                        self.queue.put((event, result, version), timeout=0.5)
+                        break
+                    except Queue.Full:
+                        pass
+        pool.close()
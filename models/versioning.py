@@ -0,0 +1,34 @@
+import hashlib
+import cPickle as pickle
+from data_pipeline import FEATURE_INPUTS, FEATURE_VERSION
+from nested import TICKET_FIELDS, PAYOUT_FIELDS
+
+# of the nested lists, only the fields nested.py reads feed the features
+NESTED_FIELDS = {'ticket_types': TICKET_FIELDS, 'previous_payouts': PAYOUT_FIELDS}
+
+
+def feature_version():
+    #Keys the feature store and the score cache; see data_pipeline.FEATURE_VERSION
+    return FEATURE_VERSION
+
+def object_version(obj):
+    #Short content hash of a fitted model (or tuple of them), like model_registry.file_version
+    return hashlib.sha1(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)).hexdigest()[:12]
+
+def raw_hash(record):
+    '''
+    Content hash of the raw fields one event's features are computed from
+    (a dict or a DataFrame row as a dict): data_pipeline.FEATURE_INPUTS,
+    and of each ticket / payout only the NESTED_FIELDS. Edits elsewhere,
+    such as a venue name or a payout address, keep the hash.
+    '''
+    values = []
+    for column in FEATURE_INPUTS:
+        value = record.get(column)
+        fields = NESTED_FIELDS.get(column)
+        if fields and isinstance(value, list):
+            value = [[item.get(f) for f in fields] if isinstance(item, dict) else item
+                     for item in value]
+        values.append(value)
+    # repr rather than json.dumps: only lists and scalars are left, and it is twice as fast
+    return hashlib.sha1(repr(values)).hexdigest()
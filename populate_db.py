@@ -1,35 +1,83 @@
 import json
-import requests
+from multiprocessing.pool import ThreadPool
 from pymongo import MongoClient
-from pymongo.errors import DuplicateKeyError, CollectionInvalid
+from pymongo.errors import BulkWriteError
 import time
+from models.upstream import DATA_POINT_URL, make_session, fetch_event
 
+DUPLICATE_KEY = 11000
 
-def single_query():
-    response = requests.get('http://galvanize-case-study-on-fraud.herokuapp.com/data_point')
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return none
-
-def query_many(table, iters):
-    for i in range(iters):
-        print "Querying:", i
-        content = single_query()
-        try:
-            # maybe check event_id
-            eid = content['object_id']
-            if not table.find_one({"object_id": eid}):
-                table.insert_one(content)
-                print "inserted!"
+
+def ensure_index(table):
+    #Dedup is enforced by Mongo, not by a find_one before every insert
+    table.create_index('object_id', unique=True)
+
+def insert_batch(table, batch):
+    '''
+    Insert a batch unordered, so one duplicate does not stop the rest.
+    Returns (inserted, dupes); any error other than a duplicate key is raised.
+    '''
+    if not batch:
+        return 0, 0
+    try:
+        result = table.insert_many(batch, ordered=False)
+        return len(result.inserted_ids), 0
+    except BulkWriteError as e:
+        errors = e.details['writeErrors']
+        if any(err['code'] != DUPLICATE_KEY for err in errors):
+            raise
+        return e.details['nInserted'], len(errors)
+
+def query_many(table, iters, workers=8, batch_size=50, poll_interval=1.0,
+               max_backoff=60.0, url=DATA_POINT_URL, session=None):
+    '''
+    Fetch `iters` events from the data_point feed, `workers` at a time over a
+    pooled session, and insert them in buffered batches.
+
+    Between rounds we wait poll_interval seconds; a round where every fetch
+    fails doubles the wait, up to max_backoff, until a fetch succeeds again.
+    '''
+    ensure_index(table)
+    session = session or make_session(workers)
+    pool = ThreadPool(workers)
+    fetch = lambda _: fetch_event(session, url)
+
+    buffered = []
+    inserted = dupes = failures = 0
+    wait = poll_interval
+    done = 0
+    try:
+        while done < iters:
+            n = min(workers, iters - done)
+            events = [event for event in pool.map(fetch, range(n)) if isinstance(event, dict)]
+            done += n
+            failures += n - len(events)
+            buffered.extend(events)
+
+            if len(buffered) >= batch_size:
+                i, d = insert_batch(table, buffered)
+                inserted, dupes = inserted + i, dupes + d
+                buffered = []
+                print "Queried: %d | inserted: %d | dupes: %d" % (done, inserted, dupes)
+
+            if events:
+                wait = poll_interval
             else:
-            	print "dupe!"
-        except DuplicateKeyError:
-            print 'DUPS!'
-        time.sleep(10)
+                wait = min(max(wait, poll_interval) * 2, max_backoff)
+            if done < iters and wait > 0:
+                time.sleep(wait)
+
+        i, d = insert_batch(table, buffered)
+        inserted, dupes = inserted + i, dupes + d
+    finally:
+        pool.close()
+        pool.join()
+
+    print "Done. inserted: %d | dupes: %d | failed fetches: %d" % (inserted, dupes, failures)
+    return inserted, dupes
 
 if __name__ == "__main__":
 	db_cilent = MongoClient()
 	db = db_cilent['fraudly']
 	table = db['fraud']
-	query_many(table, 1000)
\ No newline at end of file
+	query_many(table, 1000)
@@ -0,0 +1,100 @@
+'''
+Continuously score events ingested by populate_db.
+
+Tails the fraudly.fraud collection by _id watermark, scores new documents in
+micro-batches through feature_engineering + the serving model, and upserts
+one document per object_id into fraudly.scores:
+
+    {object_id, fraud_probability, risk_tier, label, model, model_version,
+     source_id, scored_at}
+
+The watermark is kept in fraudly.score_state, so a restarted scorer picks
+up where it stopped. _id polling is used rather than change streams so it
+also works against a standalone mongod.
+
+    python score_stream.py [--batch-size 500] [--poll-interval 1] [--once]
+'''
+import time
+import argparse
+from datetime import datetime
+from pymongo import MongoClient, UpdateOne
+from models import scoring
+from models.model_registry import registry
+
+STATE_ID = 'score_stream'
+
+
+def load_watermark(state):
+    doc = state.find_one({'_id': STATE_ID})
+    return doc['last_id'] if doc else None
+
+def save_watermark(state, last_id):
+    state.update_one({'_id': STATE_ID}, {'$set': {'last_id': last_id}}, upsert=True)
+
+def score_docs(docs, model_name):
+    '''
+    Score a micro-batch in one pass. If the batch fails (e.g. one malformed
+    event), score the events one by one so the good ones still get through;
+    failures are returned as (doc, error) pairs.
+    '''
+    try:
+        return zip(docs, scoring.score_events(docs, model_name)), []
+    except Exception:
+        scored, failed = [], []
+        for doc in docs:
+            try:
+                scored.append((doc, scoring.score_events([doc], model_name)[0]))
+            except Exception as e:
+                failed.append((doc, e))
+        return scored, failed
+
+def write_scores(scores, scored, model_name):
+    version = registry.version(model_name)
+    now = datetime.utcnow()
+    ops = []
+    for doc, result in scored:
+        update = dict(result, model=model_name, model_version=version,
+                      source_id=doc['_id'], scored_at=now)
+        ops.append(UpdateOne({'object_id': result['object_id']}, {'$set': update}, upsert=True))
+    if ops:
+        scores.bulk_write(ops, ordered=False)
+    return len(ops)
+
+def run(source, scores, state, model_name=scoring.MODEL_NAME, batch_size=500,
+        poll_interval=1.0, once=False):
+    '''
+    Score everything after the stored watermark, batch_size documents at a
+    time, then keep polling every poll_interval seconds for new ones.
+    With once=True, stop when caught up.
+    '''
+    scores.create_index('object_id', unique=True)
+    last_id = load_watermark(state)
+    total = 0
+    while True:
+        query = {'_id': {'$gt': last_id}} if last_id is not None else {}
+        docs = list(source.find(query).sort('_id', 1).limit(batch_size))
+        if not docs:
+            if once:
+                return total
+            time.sleep(poll_interval)
+            continue
+
+        scored, failed = score_docs(docs, model_name)
+        total += write_scores(scores, scored, model_name)
+        for doc, error in failed:
+            print 'could not score %s: %r' % (doc.get('object_id'), error)
+
+        last_id = docs[-1]['_id']
+        save_watermark(state, last_id)
+        print 'scored: %d | failed: %d | total: %d' % (len(scored), len(failed), total)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stream-score ingested events into fraudly.scores')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    parser.add_argument('--once', action='store_true', help='stop once caught up')
+    args = parser.parse_args()
+
+    db = MongoClient()['fraudly']
+    run(db['fraud'], db['scores'], db['score_state'], batch_size=args.batch_size,
+        poll_interval=args.poll_interval, once=args.once)
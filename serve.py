@@ -0,0 +1,107 @@
+'''
+Production runner for fraudly_app.
+
+    python serve.py --workers 4 --port 8080
+
+The app (and with it gdbr.pickle and the operating point) is imported once
+in the master, which then binds the port and forks the workers. Workers
+share the loaded model pages copy-on-write and accept on the same socket.
+The master restarts any worker that dies and stops them all on
+SIGTERM/SIGINT.
+
+Each worker shares its /metrics numbers through a temporary directory
+(models.metrics.Metrics.share), so a scrape that lands on any worker
+reports the sum over all of them.
+
+With --threaded each worker handles requests on a thread apiece, which is
+what lets FRAUDLY_COALESCE_MS batch concurrent scoring calls.
+
+`application` is also a plain WSGI entry point, e.g.
+    gunicorn --preload -w 4 -b 0.0.0.0:8080 serve:application
+'''
+import os
+import sys
+import errno
+import shutil
+import signal
+import argparse
+import tempfile
+import multiprocessing
+from SocketServer import ThreadingMixIn
+from wsgiref.simple_server import make_server, WSGIServer, WSGIRequestHandler
+
+from fraudly_app import app, PORT, metric_gauges
+from models.metrics import metrics
+
+application = app
+
+
+class QuietHandler(WSGIRequestHandler):
+    #wsgiref logs every request to stderr; leave access logs to the proxy
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def run_worker(server, metrics_dir):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    metrics.share(metrics_dir, metric_gauges)
+    try:
+        server.serve_forever()
+    finally:
+        os._exit(0)
+
+def spawn(server, metrics_dir):
+    pid = os.fork()
+    if pid == 0:
+        run_worker(server, metrics_dir)
+    return pid
+
+def serve(host='0.0.0.0', port=PORT, workers=None, threaded=False):
+    workers = workers or multiprocessing.cpu_count()
+    server_class = ThreadingWSGIServer if threaded else WSGIServer
+    server = make_server(host, port, application, server_class=server_class,
+                         handler_class=QuietHandler)
+    metrics_dir = tempfile.mkdtemp(prefix='fraudly-metrics-')
+    children = set(spawn(server, metrics_dir) for _ in range(workers))
+    print 'fraudly: master %d serving on %s:%d with %d workers' % (os.getpid(), host, port, workers)
+
+    state = {'stopping': False}
+    def stop(signum, frame):
+        state['stopping'] = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                continue
+            raise
+        children.discard(pid)
+        if not state['stopping']:
+            print 'fraudly: worker %d exited (status %d), restarting' % (pid, status)
+            children.add(spawn(server, metrics_dir))
+    server.server_close()
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pre-fork server for fraudly_app')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes (default: one per core)')
+    parser.add_argument('--threaded', action='store_true',
+                        help='serve each request on its own thread within a worker')
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.threaded)
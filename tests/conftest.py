@@ -0,0 +1,56 @@
+import os
+import sys
+import threading
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+
+import pytest
+
+# scripts live at the repo root and import models.*; the modules inside
+# models/ import each other as top-level names
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'models'))
+sys.path.insert(0, ROOT)
+
+
+class StubFeed(ThreadingMixIn, HTTPServer):
+    '''
+    data_point stand-in that plays back a script of (status, body) pairs,
+    one per request, in arrival order. Once the script runs out every
+    request gets a 503.
+    '''
+    daemon_threads = True
+
+    def __init__(self, script):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StubHandler)
+        self.script = list(script)
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d/data_point' % self.server_port
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        with self.server.lock:
+            status, body = self.server.script.pop(0) if self.server.script else (503, 'done')
+        self.send_response(status)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def feed(request):
+    def start(script):
+        server = StubFeed(script)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        request.addfinalizer(server.shutdown)
+        return server
+    return start
@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from coalescer import ScoreCoalescer
+
+
+def make_coalescer(max_batch):
+    calls = []
+    def score(events):
+        calls.append(list(events))
+        if 'bad' in events:
+            raise ValueError('malformed event')
+        return [event.upper() for event in events]
+    # a long max_wait, so the batch closes only once it holds max_batch events
+    return ScoreCoalescer(score, max_batch=max_batch, max_wait=5.), calls
+
+def score_concurrently(coalescer, requests):
+    outcomes = [None] * len(requests)
+    def call(i):
+        try:
+            outcomes[i] = coalescer.score(requests[i], timeout=10)
+        except ValueError as e:
+            outcomes[i] = e
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_batches_concurrent_requests():
+    coalescer, calls = make_coalescer(max_batch=4)
+    outcomes = score_concurrently(coalescer, [['a'], ['b', 'c'], ['d']])
+
+    assert sorted(outcomes) == [['A'], ['B', 'C'], ['D']]
+    assert len(calls) == 1
+    assert coalescer.stats()['batches'] == 1
+
+def test_only_the_bad_request_fails_in_a_mixed_batch():
+    coalescer, calls = make_coalescer(max_batch=4)
+    requests = [['a'], ['bad'], ['b', 'c']]
+    outcomes = score_concurrently(coalescer, requests)
+
+    assert outcomes[0] == ['A']
+    assert isinstance(outcomes[1], ValueError)
+    assert outcomes[2] == ['B', 'C']
+    # one failed batch call, then one call per request
+    assert len(calls) == 4
+    assert sorted(calls[1:]) == sorted(requests)
+    assert coalescer.stats()['failed_batches'] == 1
+
+def test_a_lone_failing_request_is_not_rescored():
+    coalescer, calls = make_coalescer(max_batch=1)
+    with pytest.raises(ValueError):
+        coalescer.score(['bad'], timeout=10)
+    assert calls == [['bad']]
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+
+from compiled_trees import CompiledEnsemble
+
+
+@pytest.fixture(scope='module')
+def data():
+    X, y = make_classification(n_samples=600, n_features=22, n_informative=8,
+                               weights=[.9, .1], random_state=3)
+    return X[:400], y[:400], X[400:]
+
+def fitted(kind, X, y):
+    if kind == 'gbm':
+        return GradientBoostingClassifier(n_estimators=50, max_depth=3, random_state=1).fit(X, y)
+    return RandomForestClassifier(n_estimators=30, class_weight={1: 9}, random_state=1).fit(X, y)
+
+
+@pytest.mark.parametrize('kind', ['gbm', 'rf'])
+def test_matches_sklearn(data, kind):
+    X, y, X_new = data
+    model = fitted(kind, X, y)
+    compiled = CompiledEnsemble.from_model(model)
+
+    np.testing.assert_allclose(compiled.predict_proba(X_new), model.predict_proba(X_new),
+                               rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(compiled.predict(X_new), model.predict(X_new))
+
+@pytest.mark.parametrize('kind', ['gbm', 'rf'])
+def test_save_load_round_trip(data, kind, tmpdir):
+    X, y, X_new = data
+    compiled = CompiledEnsemble.from_model(fitted(kind, X, y))
+    path = os.path.join(str(tmpdir), '%s.npz' % kind)
+    compiled.save(path)
+    loaded = CompiledEnsemble.load(path)
+
+    assert loaded.kind == kind
+    np.testing.assert_array_equal(loaded.predict_proba(X_new), compiled.predict_proba(X_new))
+
+@pytest.mark.parametrize('kind', ['gbm', 'rf'])
+def test_empty_batch(data, kind):
+    X, y, _ = data
+    compiled = CompiledEnsemble.from_model(fitted(kind, X, y))
+    empty = np.empty((0, X.shape[1]))
+
+    assert compiled.predict_proba(empty).shape == (0, 2)
+    assert compiled.predict(empty).shape == (0,)
+
+def test_rejects_non_deviance_gbm(data):
+    X, y, _ = data
+    model = GradientBoostingClassifier(loss='exponential', n_estimators=5, random_state=1).fit(X, y)
+    with pytest.raises(ValueError):
+        CompiledEnsemble.from_model(model)
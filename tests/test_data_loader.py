@@ -0,0 +1,41 @@
+import os
+import sys
+import json
+
+import pandas as pd
+
+from sklearn.cross_validation import train_test_split
+
+from data_pipeline import get_data, DATA_COLUMNS, FRAUD_ACCT_TYPES
+from data_loader import iter_chunks
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+from synthetic import make_events
+
+
+def write_events(tmpdir, n):
+    path = str(tmpdir.join('data.json'))
+    with open(path, 'w') as f:
+        json.dump(make_events(n, seed=5), f)
+    return path
+
+def test_chunks_cover_every_event(tmpdir):
+    path = write_events(tmpdir, 25)
+    chunks = list(iter_chunks(path, chunksize=10))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert list(pd.concat(chunks)['object_id']) == [e['object_id'] for e in make_events(25, seed=5)]
+
+def test_get_data_splits_like_read_json(tmpdir):
+    path = write_events(tmpdir, 40)
+    X_train, X_test, y_train, y_test = get_data(path, chunksize=7)
+
+    # the split the pd.read_json version of get_data made
+    df = pd.read_json(path)
+    df['fraud'] = df['acct_type'].isin(FRAUD_ACCT_TYPES).astype(int)
+    old = train_test_split(df[DATA_COLUMNS], df['fraud'], test_size=.3, random_state=1234)
+
+    assert list(X_train.columns) == DATA_COLUMNS
+    for new, expected in zip([X_train, X_test, y_train, y_test], old):
+        assert list(new.index) == list(expected.index)
+    assert list(X_test['object_id']) == list(old[1]['object_id'])
+    assert list(y_test) == list(old[3])
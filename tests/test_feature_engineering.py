@@ -0,0 +1,99 @@
+from __future__ import division
+import os
+import sys
+import string
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline import feature_engineering, FRAUDY_COUNTRIES
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+from synthetic import make_events
+
+
+# The per-row expressions feature_engineering used before it was vectorized
+
+def get_tix(ticket_types, value):
+    total = 0
+    for ticket in ticket_types:
+        total += ticket[value]
+    return total
+
+def caps_prop(description_string):
+    if description_string:
+        caps = len([c for c in description_string if c in string.ascii_uppercase])
+        return caps / len(description_string)
+    else:
+        return .045
+
+def baseline_features(df):
+    df = df.copy()
+    df['has_previous_payouts'] = df.previous_payouts.apply(lambda x: int(x == []))
+    df['gts_is_0'] = df.gts.apply(lambda x: int(x == 0))
+    df['gts_less_10'] = df.gts.apply(lambda x: int(0 < x < 10))
+    df['gts_less_25'] = df.gts.apply(lambda x: int(10 < x < 25))
+    df['venue_outside_user_country'] = (df.venue_country != df.country).astype(int)
+    df['num_tix_total'] = df.ticket_types.apply(get_tix, args=("quantity_total",))
+    df['num_tix_sold_by_event'] = df.ticket_types.apply(get_tix, args=("quantity_sold",))
+    df['num_payouts'] = df.previous_payouts.apply(lambda x: len(x))
+    df['email_gmail'] = (df.email_domain == "gmail.com").astype(int)
+    df['email_yahoo'] = (df.email_domain == "yahoo.com").astype(int)
+    df['email_hotmail'] = (df.email_domain == "hotmail.com").astype(int)
+    df['email_aol'] = (df.email_domain == "aol.com").astype(int)
+    df['email_com'] = (df.email_domain.apply(lambda x: x[-3:]) == "com").astype(int)
+    df['email_org'] = (df.email_domain.apply(lambda x: x[-3:]) == "org").astype(int)
+    df['email_edu'] = (df.email_domain.apply(lambda x: x[-3:]) == "edu").astype(int)
+    df['high_fraud_country'] = df.country.apply(lambda x: 1 if x in FRAUDY_COUNTRIES else 0)
+    df['exclamation_points'] = df['description'].apply(lambda x: x.count('!'))
+    df['caps_proportion'] = df['description'].apply(caps_prop)
+    return df
+
+
+def events():
+    rows = make_events(300, seed=7)
+    edge_cases = [
+        {'gts': 10.},                                   # on the gts_less_10 / gts_less_25 boundary
+        {'gts': 0.},
+        {'gts': 25.},
+        {'description': ''},                            # caps_proportion falls back to .045
+        {'previous_payouts': []},
+        {'previous_payouts': [], 'ticket_types': []},
+        {'email_domain': 'charity.org'},
+        {'email_domain': 'university.edu'},
+        {'email_domain': 'mail.com'},
+        {'country': 'NG', 'venue_country': 'NG'},
+        {'country': '', 'venue_country': 'US'},
+    ]
+    for row, changes in zip(rows, edge_cases):
+        row.update(changes)
+    return pd.DataFrame(rows)
+
+
+def test_matches_baseline_on_every_column():
+    df = events()
+    new = feature_engineering(df.copy())
+    old = baseline_features(df)
+
+    assert len(new.columns) == 22
+    for column in new.columns:
+        np.testing.assert_array_equal(new[column].values.astype(float),
+                                      old[column].values.astype(float), err_msg=column)
+
+def test_edge_cases_hit_the_boundaries():
+    new = feature_engineering(events())
+    assert new['gts_less_10'][0] == 0 and new['gts_less_25'][0] == 0
+    assert new['gts_is_0'][1] == 1
+    assert new['gts_less_25'][2] == 0
+    assert new['caps_proportion'][3] == .045
+    assert new['has_previous_payouts'][4] == 1 and new['num_payouts'][4] == 0
+    assert new['num_tix_total'][5] == 0 and new['num_tix_sold_by_event'][5] == 0
+    assert (new['email_org'][6], new['email_edu'][7], new['email_com'][8]) == (1, 1, 1)
+    assert new['high_fraud_country'][9] == 1
+    assert new['venue_outside_user_country'][10] == 1
+
+def test_single_event_matches_batch():
+    df = events()
+    batch = feature_engineering(df.copy())
+    single = feature_engineering(df.iloc[[42]].copy())
+    np.testing.assert_array_equal(single.values.astype(float), batch.iloc[[42]].values.astype(float))
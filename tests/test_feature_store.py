@@ -0,0 +1,55 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline import feature_engineering, TOPICS, TOPIC_COLUMNS
+from feature_store import FeatureStore
+from text_cleaning import clean_column
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+from synthetic import make_events
+
+
+def test_stores_and_recomputes_changed_events(tmpdir):
+    df = pd.DataFrame(make_events(50, seed=3))
+    store = FeatureStore(root=str(tmpdir), version='test')
+
+    first = store.features(df.copy())
+    np.testing.assert_array_equal(first.values, feature_engineering(df.copy()).values)
+    assert os.path.exists(store.path)
+
+    # a corrected event under the same object_id is recomputed, the rest are read back
+    df.at[0, 'gts'] = 0.
+    second = store.features(df.copy())
+    assert second['gts_is_0'].iloc[0] == 1
+    np.testing.assert_array_equal(second.values[1:], first.values[1:])
+    assert len(store.load()) == 50
+
+def fit_topics(df, alpha):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.naive_bayes import MultinomialNB
+    vectorizer = TfidfVectorizer(max_features=500)
+    X = vectorizer.fit_transform(clean_column(df['description']))
+    labels = np.array(TOPICS)[np.arange(X.shape[0]) % len(TOPICS)]
+    return vectorizer, MultinomialNB(alpha=alpha).fit(X, labels)
+
+def test_topic_features_are_stored_per_topic_model(tmpdir):
+    df = pd.DataFrame(make_events(30, seed=4))
+    store = FeatureStore(root=str(tmpdir), version='test')
+    vectorizer, topic_model = fit_topics(df, alpha=1.)
+    _, other_model = fit_topics(df, alpha=.1)
+
+    plain = store.features(df.copy())
+    topics = store.features(df.copy(), vectorizer, topic_model)
+    assert list(topics.columns) == list(plain.columns) + TOPIC_COLUMNS
+    np.testing.assert_array_equal(topics.values,
+                                  feature_engineering(df.copy(), vectorizer, topic_model).values)
+
+    paths = set([store.path, store.path_for(vectorizer, topic_model), store.path_for(vectorizer, other_model)])
+    assert len(paths) == 3
+    assert sorted(os.listdir(str(tmpdir))) == sorted(os.path.basename(p) for p in paths
+                                                     if p != store.path_for(vectorizer, other_model))
+    # the plain store was not overwritten with topic columns
+    assert list(store.features(df.copy()).columns) == list(plain.columns)
@@ -0,0 +1,49 @@
+import multiprocessing
+
+from metrics import Metrics, read_shared
+
+
+def worker(directory, n, ready, go, scrapes):
+    # one serve.py worker: its own Metrics, shared after the fork
+    metrics = Metrics()
+    metrics.share(directory, gauges=lambda: {'score_cache_hits': n}, interval=60)
+    for _ in range(n):
+        with metrics.timer('predict'):
+            pass
+    metrics.incr('upstream_fetch_errors', n)
+    metrics.flush()
+    ready.release()
+    go.wait()
+    scrapes.put(metrics.prometheus({'score_cache_hits': n}))
+
+
+def test_a_scrape_on_any_worker_reports_all_of_them(tmpdir):
+    directory = str(tmpdir)
+    ready, go, scrapes = multiprocessing.Semaphore(0), multiprocessing.Event(), multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=worker, args=(directory, n, ready, go, scrapes))
+               for n in (3, 5)]
+    for process in workers:
+        process.start()
+    for _ in workers:
+        ready.acquire()
+    go.set()
+    texts = [scrapes.get(timeout=10) for _ in workers]
+    for process in workers:
+        process.join()
+
+    for text in texts:
+        assert 'fraudly_stage_seconds_count{stage="predict"} 8' in text
+        assert 'fraudly_stage_seconds_bucket{stage="predict",le="+Inf"} 8' in text
+        assert 'fraudly_upstream_fetch_errors_total 8' in text
+        assert 'fraudly_score_cache_hits 8.0' in text
+
+    # the workers have exited; their counts stay, so counters never go backwards
+    combined, gauges = read_shared(directory)
+    assert combined.histograms['predict'].count == 8
+    assert combined.counters == {'upstream_fetch_errors': 8}
+    assert gauges == {'score_cache_hits': 8}
+
+def test_unshared_metrics_are_per_process():
+    metrics = Metrics()
+    metrics.observe('predict', .001)
+    assert 'fraudly_stage_seconds_count{stage="predict"} 1' in metrics.prometheus()
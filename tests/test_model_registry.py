@@ -0,0 +1,37 @@
+import os
+import cPickle as pickle
+
+import pytest
+
+from model_registry import ModelRegistry
+
+
+def write(path, data, mtime):
+    with open(path, 'wb') as f:
+        f.write(data)
+    os.utime(path, (mtime, mtime))
+
+def test_failed_reload_keeps_last_good_artifact(tmpdir):
+    path = os.path.join(str(tmpdir), 'model.pickle')
+    write(path, pickle.dumps({'model': 1}), 1000)
+    registry = ModelRegistry(check_interval=0)
+    registry.register('model', path)
+    assert registry.get('model') == {'model': 1}
+    version = registry.version('model')
+
+    # a half-written pickle with a fresh mtime
+    write(path, pickle.dumps({'model': 2})[:5], 2000)
+    assert registry.get('model') == {'model': 1}
+    assert registry.version('model') == version
+
+    # the finished write is picked up at the next check
+    write(path, pickle.dumps({'model': 2}), 3000)
+    assert registry.get('model') == {'model': 2}
+    assert registry.version('model') != version
+
+def test_first_load_failure_is_raised(tmpdir):
+    path = os.path.join(str(tmpdir), 'missing.pickle')
+    registry = ModelRegistry()
+    registry.register('model', path)
+    with pytest.raises(IOError):
+        registry.get('model')
@@ -0,0 +1,60 @@
+import json
+
+import mongomock
+import pytest
+
+import populate_db
+
+
+def event(object_id):
+    return 200, json.dumps({'object_id': object_id, 'name': 'event %d' % object_id})
+
+def not_json():
+    return 200, '<html><body>Application error</body></html>'
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waits = []
+    monkeypatch.setattr(populate_db.time, 'sleep', waits.append)
+    return waits
+
+
+def test_query_many_dedups_and_backs_off(feed, sleeps):
+    server = feed([
+        # round 1: object 2 twice in the same batch
+        event(1), event(2), event(2), event(3),
+        # round 2: every fetch fails, including 200s that are not JSON
+        (500, 'error'), not_json(), not_json(), (503, 'busy'),
+        # round 3: object 3 again, already inserted by the first batch
+        event(3), event(4), event(5), event(6),
+    ])
+    table = mongomock.MongoClient()['fraudly']['fraud']
+
+    inserted, dupes = populate_db.query_many(table, 12, workers=4, batch_size=4,
+                                             poll_interval=1.0, max_backoff=60.0,
+                                             url=server.url)
+
+    assert (inserted, dupes) == (6, 2)
+    assert sorted(doc['object_id'] for doc in table.find()) == [1, 2, 3, 4, 5, 6]
+    # poll after round 1, doubled wait after the failed round 2, none after the last
+    assert sleeps == [1.0, 2.0]
+
+def test_backoff_is_capped_and_resets(feed, sleeps):
+    server = feed([not_json()] * 3 + [event(1)] + [not_json()])
+    table = mongomock.MongoClient()['fraudly']['fraud']
+
+    inserted, dupes = populate_db.query_many(table, 5, workers=1, batch_size=10,
+                                             poll_interval=1.0, max_backoff=3.0,
+                                             url=server.url)
+
+    assert (inserted, dupes) == (1, 0)
+    assert sleeps == [2.0, 3.0, 3.0, 1.0]
+
+def test_insert_batch_raises_on_other_write_errors():
+    class Failing(object):
+        def insert_many(self, batch, ordered=True):
+            raise populate_db.BulkWriteError({'writeErrors': [{'code': 121}], 'nInserted': 0})
+
+    with pytest.raises(populate_db.BulkWriteError):
+        populate_db.insert_batch(Failing(), [{'object_id': 1}])
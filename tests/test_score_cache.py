@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+
+import scoring
+from score_cache import ScoreCache, ShelveBackend
+
+
+def test_corrected_event_is_rescored(monkeypatch):
+    scored = []
+    def fraud_probabilities(df, model_name):
+        scored.extend(df['object_id'])
+        return np.where(df['gts'] > 0, .2, .9)
+    monkeypatch.setattr(scoring, 'fraud_probabilities', fraud_probabilities)
+    monkeypatch.setattr(scoring.registry, 'version', lambda name: 'v1')
+    cache = ScoreCache()
+
+    event = {'object_id': 7, 'gts': 100.}
+    assert scoring.cached_probabilities([event], 'gdbr', cache)[0] == .2
+    assert scoring.cached_probabilities([dict(event)], 'gdbr', cache)[0] == .2
+    assert scored == [7]
+
+    # same object_id, corrected fields: not served from the cache
+    assert scoring.cached_probabilities([{'object_id': 7, 'gts': 0.}], 'gdbr', cache)[0] == .9
+    assert scored == [7, 7]
+
+def test_key_ignores_fields_the_features_do_not_read():
+    cache = ScoreCache()
+    event = {'object_id': 7, 'gts': 100., 'venue_name': 'Hall',
+             'previous_payouts': [{'amount': 50., 'address': '1 Main St'}]}
+    key = cache.key(event, 'v1')
+
+    renamed = dict(event, venue_name='Other hall',
+                   previous_payouts=[{'amount': 50., 'address': '2 High St'}])
+    assert cache.key(renamed, 'v1') == key
+    assert cache.key(dict(event, previous_payouts=[{'amount': 60.}]), 'v1') != key
+    assert cache.key(event, 'v2') != key
+
+def test_shelve_backend_is_per_process_scratch(tmpdir):
+    path = os.path.join(str(tmpdir), 'scores')
+    # left behind by a worker that was killed (no such pid)
+    orphan = tmpdir.join('scores.999999999')
+    orphan.write('')
+
+    backend = ShelveBackend(path, sync_every=1)
+    backend.set('k', .5, ttl=60)
+    assert backend.get('k') == .5
+    names = os.listdir(str(tmpdir))
+    assert any(name.startswith('scores.%d' % os.getpid()) for name in names)
+    assert 'scores.999999999' not in names
+
+    backend.close()
+    assert os.listdir(str(tmpdir)) == []
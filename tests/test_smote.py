@@ -0,0 +1,30 @@
+import numpy as np
+from sklearn.datasets import make_classification
+
+from data_pipeline import smote
+
+
+def data():
+    return make_classification(n_samples=1000, n_features=5, weights=[.9, .1], random_state=2)
+
+def test_oversamples_to_target():
+    X, y = data()
+    X_smoted, y_smoted = smote(X, y, target=.3, random_state=1)
+    assert abs(y_smoted.mean() - .3) < .001
+    np.testing.assert_array_equal(X_smoted[:len(X)], X)
+    np.testing.assert_array_equal(y_smoted[:len(y)], y)
+
+def test_seed_alone_determines_output():
+    X, y = data()
+    default, _ = smote(X, y, target=.3, random_state=1)
+    chunked, _ = smote(X, y, target=.3, random_state=1, chunksize=7)
+    np.testing.assert_array_equal(default, chunked)
+
+def test_synthetic_points_lie_between_positives():
+    X, y = data()
+    X_smoted, _ = smote(X, y, target=.3, random_state=1)
+    positives = X[y == 1]
+    new = X_smoted[len(X):]
+    # every synthetic point stays inside the positives' bounding box
+    assert (new >= positives.min(axis=0) - 1e-12).all()
+    assert (new <= positives.max(axis=0) + 1e-12).all()
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pytest
+from bs4 import BeautifulSoup
+
+import text_cleaning
+from lru import LRUCache
+from text_cleaning import strip_html
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+from synthetic import make_events
+
+
+EDGE_CASES = [
+    u'plain text, no markup',
+    u'<p>one</p>\r\n<p>two</p>',                    # whitespace-only runs between tags collapse
+    u'<p>one</p>   <p>two</p>',
+    u'<pre>\n  </pre>kept',                         # ...but not inside pre / textarea
+    u'<textarea> </textarea>kept',
+    u'<p> &amp; </p>',
+    u'Tom &amp; Jerry &lt;3 &copy; &#169; &#xA9; &nbsp;end',
+    u'x &amp y',
+    u'<!-- comment -->Hi<br/>there',
+    u'<!DOCTYPE html><p>x</p>',
+    u'<![CDATA[cdata]]>after',
+    u'<p>unclosed <b>bold',
+    u'a < b and c > d',
+    u'<p>caf\xe9 &eacute;</p>',
+    u'<a href="http://www.example.com/">link</a>',
+]
+
+def samples():
+    events = make_events(200, seed=11)
+    return ([e['description'] for e in events] +
+            [e['org_desc'] for e in events if e['org_desc']] + EDGE_CASES)
+
+
+def test_matches_beautifulsoup_get_text():
+    # script / style bodies are left out: bs4 4.10+ drops them from
+    # get_text() and the Python 2 releases keep them
+    for cell in samples():
+        assert strip_html(cell) == BeautifulSoup(cell, 'html.parser').get_text(), cell
+
+def test_parse_errors_fall_back_to_beautifulsoup(monkeypatch):
+    def reject(self, data):
+        raise text_cleaning.HTMLParseError('malformed')
+    monkeypatch.setattr(text_cleaning._TextExtractor, 'feed', reject)
+    before = text_cleaning.metrics.snapshot()[1].get('html_parse_fallbacks', 0)
+
+    cell = u'<p>one</p><p>two &amp; three</p>'
+    assert strip_html(cell) == BeautifulSoup(cell, text_cleaning.FALLBACK_PARSER).get_text()
+    assert text_cleaning.metrics.snapshot()[1]['html_parse_fallbacks'] == before + 1
+
+def test_lru_evicts_by_bytes():
+    cache = LRUCache(maxsize=100, maxbytes=10, sizeof=len)
+    cache.put('a', u'x' * 4)
+    cache.put('b', u'x' * 4)
+    cache.put('c', u'x' * 4)
+    assert (cache.get('a'), len(cache), cache.bytes) == (None, 2, 8)
+
+    cache.put('b', u'x')  # replacing a value releases its old size
+    assert cache.bytes == 5
+    cache.put('big', u'x' * 50)  # larger than maxbytes: kept alone
+    assert (len(cache), cache.get('big')) == (1, u'x' * 50)
@@ -0,0 +1,66 @@
+import json
+
+from upstream import EventPrefetcher, fetch_event
+
+
+def event(object_id, **fields):
+    return 200, json.dumps(dict(fields, object_id=object_id))
+
+
+class Scorer(object):
+    #score callable for the prefetcher: tags each result with the current version
+    def __init__(self):
+        self.version = 'v1'
+        self.calls = []
+
+    def __call__(self, events):
+        self.calls.append([e['object_id'] for e in events])
+        if any(e.get('malformed') for e in events):
+            raise KeyError('gts')
+        return [{'object_id': e['object_id'], 'version': self.version} for e in events]
+
+
+def test_fetch_event_returns_none_on_failures(feed):
+    server = feed([event(1), (500, 'error'), (200, 'not json')])
+    assert fetch_event(url=server.url) == {'object_id': 1}
+    assert fetch_event(url=server.url) is None
+    assert fetch_event(url=server.url) is None
+
+def test_prefetches_scored_events_and_drops_non_objects(feed):
+    server = feed([event(1), (200, '[1, 2]'), event(2), (200, '"text"')])
+    scorer = Scorer()
+    prefetcher = EventPrefetcher(scorer, url=server.url, batch_size=4, version=lambda: scorer.version)
+    try:
+        pairs = [prefetcher.get(timeout=5) for _ in range(2)]
+    finally:
+        prefetcher.stop()
+
+    assert sorted(e['object_id'] for e, _ in pairs) == [1, 2]
+    assert all(result['version'] == 'v1' for _, result in pairs)
+    assert sorted(scorer.calls[0]) == [1, 2]
+
+def test_rescores_results_from_an_old_model(feed):
+    server = feed([event(1), event(2)])
+    scorer = Scorer()
+    prefetcher = EventPrefetcher(scorer, url=server.url, batch_size=2, version=lambda: scorer.version)
+    try:
+        first = prefetcher.get(timeout=5)
+        scorer.version = 'v2'  # the registry reloaded the model
+        second = prefetcher.get(timeout=5)
+    finally:
+        prefetcher.stop()
+
+    assert first[1]['version'] == 'v1'
+    assert second[1] == {'object_id': second[0]['object_id'], 'version': 'v2'}
+    assert scorer.calls[-1] == [second[0]['object_id']]
+
+def test_a_bad_event_does_not_drop_its_batch(feed):
+    server = feed([event(1), event(2, malformed=True), event(3)])
+    scorer = Scorer()
+    prefetcher = EventPrefetcher(scorer, url=server.url, batch_size=3)
+    try:
+        pairs = [prefetcher.get(timeout=5) for _ in range(2)]
+    finally:
+        prefetcher.stop()
+
+    assert sorted(e['object_id'] for e, _ in pairs) == [1, 3]
@@ -2,7 +2,7 @@ from __future__ import division
 
 import numpy as np
 import pandas as pd
-from bs4 import BeautifulSoup
+from models.text_cleaning import clean_column
 
 from sklearn.cross_validation import train_test_split
 from sklearn.linear_model import LogisticRegression
@@ -23,13 +23,9 @@ import re
 
 def topic_dummies(df):
 
-    #CLEAN HTML FUNCTION
-    def get_text(cell):
-        return BeautifulSoup(cell, 'html.parser').get_text()
-
-    #Parse descriptions using html function above:
-    df['description'] = df['description'].apply(get_text)
-    df['org_desc'] = df['org_desc'].apply(get_text)
+    #Parse descriptions out of their html
+    df['description'] = clean_column(df['description'])
+    df['org_desc'] = clean_column(df['org_desc'])
     clean = df['description']
 
     #All the parameters for the topic modeling.